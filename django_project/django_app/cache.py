@@ -0,0 +1,110 @@
+"""
+Conditional GETs and the response cache of the API, both keyed by data versions.
+
+A response depends on the request and on the data versions of the scopes it
+shows: a competition's analytics on the competition's version, a team's on
+the team's, a list on the global one. The pooling service bumps those
+versions after every write, so the same digest identifies the response until
+its data changes. It is the strong ETag answered with a 304 before the view
+runs, and the key of the cached analytics responses; the cache timeout only
+bounds memory.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import DataVersion, Match, Player
+
+GLOBAL_SCOPE = (DataVersion.GLOBAL, 0)
+
+
+def data_versions(scopes: list) -> tuple:
+    """Current version of each ``(scope, scope_id)``, 0 for a scope never written, in one query."""
+    condition = Q()
+    for scope, scope_id in scopes:
+        condition |= Q(scope=scope, scope_id=scope_id)
+    versions = {
+        (scope, scope_id): version
+        for scope, scope_id, version in DataVersion.objects.filter(condition).values_list('scope', 'scope_id', 'version')
+    }
+    return tuple(versions.get((scope, int(scope_id)), 0) for scope, scope_id in scopes)
+
+
+def response_digest(request, scopes: list, versions: tuple) -> str:
+    """Identity of a response: path and query string, rendered format, and the versions it was built from."""
+    identity = f"{request.get_full_path()}|{request.accepted_renderer.format}|{scopes}|{versions}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def not_modified(request, etag: str) -> bool:
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in if_none_match or etag in if_none_match
+
+
+def by_data_version(scopes, cache_responses: bool = False):
+    """
+    Conditional GET for an APIView's ``get``, on the data versions of
+    ``scopes(request, **kwargs)``, a list of ``(scope, scope_id)``: the
+    response carries their ETag and a matching ``If-None-Match`` gets a 304
+    without running the view. With ``cache_responses``, successful responses
+    are also cached under them.
+    """
+    def decorator(get):
+        @wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            view_scopes = scopes(request, **kwargs)
+            digest = response_digest(request, view_scopes, data_versions(view_scopes))
+            etag = f'"{digest}"'
+            if not_modified(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+            data = cache.get(f"analytics:{digest}") if cache_responses else None
+            if data is not None:
+                return Response(data, headers={'ETag': etag})
+            response = get(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if cache_responses:
+                    cache.set(f"analytics:{digest}", response.data, settings.ANALYTICS_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def cached_by_data_version(scopes):
+    """``by_data_version`` that also caches the responses, for the analytics views."""
+    return by_data_version(scopes, cache_responses=True)
+
+
+def global_scope(request, **kwargs) -> list:
+    return [GLOBAL_SCOPE]
+
+
+def competition_scope(request, competition_id) -> list:
+    return [(DataVersion.COMPETITION, competition_id)]
+
+
+def team_scope(request, team_id) -> list:
+    return [(DataVersion.TEAM, team_id)]
+
+
+def team_comparison_scope(request, team1_id, team2_id) -> list:
+    return [(DataVersion.TEAM, team1_id), (DataVersion.TEAM, team2_id)]
+
+
+def match_scope(request, match_id) -> list:
+    """Head-to-head and form of a match come from the matches of its two teams."""
+    match = Match.objects.filter(id=match_id).values_list('home_team_id', 'away_team_id').first()
+    if match is None:
+        return [GLOBAL_SCOPE]
+    return [(DataVersion.TEAM, team_id) for team_id in match if team_id is not None] or [GLOBAL_SCOPE]
+
+
+def player_scope(request, player_id) -> list:
+    team_id = Player.objects.filter(id=player_id).values_list('team_id', flat=True).first()
+    return [(DataVersion.TEAM, team_id)] if team_id is not None else [GLOBAL_SCOPE]
@@ -147,3 +147,45 @@ class Standing(models.Model):
 
     def __str__(self):
         return f"{self.team} - {self.points} points ({self.competition}, {self.season})"
+
+
+class TeamSeasonAggregate(models.Model):
+    """Standings line of a team in a competition season, maintained by the Spark streaming stage."""
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, null=True)
+    competition = models.ForeignKey(Competition, on_delete=models.CASCADE, null=True)
+    season = models.CharField(max_length=20, null=True, default='')
+    played_games = models.IntegerField(default=0)
+    won = models.IntegerField(default=0)
+    draw = models.IntegerField(default=0)
+    lost = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+    goals_for = models.IntegerField(default=0)
+    goals_against = models.IntegerField(default=0)
+    goal_difference = models.IntegerField(default=0)
+    form = models.CharField(max_length=10, null=True, default='')
+    last_match_date = models.DateField(null=True)
+
+    class Meta:
+        db_table = 'team_season_aggregates'
+        unique_together = ('team', 'competition', 'season')
+
+    def __str__(self):
+        return f"{self.team} - {self.points} points ({self.competition}, {self.season})"
+
+
+class DataVersion(models.Model):
+    """Write counter of a scope (everything, a competition, a team), bumped by the pooling service."""
+    GLOBAL = 'global'
+    COMPETITION = 'competition'
+    TEAM = 'team'
+
+    scope = models.CharField(max_length=20)
+    scope_id = models.BigIntegerField(default=0)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'data_versions'
+        unique_together = ('scope', 'scope_id')
+
+    def __str__(self):
+        return f"{self.scope} {self.scope_id}: v{self.version}"
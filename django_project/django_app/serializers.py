@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.db.models import Count, Avg, Sum, F, Q
 from .models import Team, Competition, Match, TopScorer, Standing, Coach, Player, Area
+from .standings import compute_standings
+from .timeseries import downsample, goals_by_bucket
 
 class TeamSerializer(serializers.ModelSerializer):
     area_name = serializers.CharField(source='area.name', read_only=True, default='Unknown')
@@ -307,52 +309,7 @@ class CompetitionAnalyticsSerializer(serializers.ModelSerializer):
         }
 
     def get_standings(self, obj):
-        teams = Team.objects.filter(
-            Q(home_matches__competition=obj) | Q(away_matches__competition=obj)
-        ).distinct()
-        
-        standings = []
-        for team in teams:
-            home_matches = Match.objects.filter(competition=obj, home_team=team)
-            away_matches = Match.objects.filter(competition=obj, away_team=team)
-            
-            home_stats = home_matches.aggregate(
-                wins=Count('id', filter=Q(home_team_score__gt=F('away_team_score'))),
-                draws=Count('id', filter=Q(home_team_score=F('away_team_score'))),
-                losses=Count('id', filter=Q(home_team_score__lt=F('away_team_score'))),
-                goals_for=Sum('home_team_score', default=0),
-                goals_against=Sum('away_team_score', default=0)
-            )
-            
-            away_stats = away_matches.aggregate(
-                wins=Count('id', filter=Q(away_team_score__gt=F('home_team_score'))),
-                draws=Count('id', filter=Q(away_team_score=F('home_team_score'))),
-                losses=Count('id', filter=Q(away_team_score__lt=F('home_team_score'))),
-                goals_for=Sum('away_team_score', default=0),
-                goals_against=Sum('home_team_score', default=0)
-            )
-            
-            total_wins = (home_stats['wins'] or 0) + (away_stats['wins'] or 0)
-            total_draws = (home_stats['draws'] or 0) + (away_stats['draws'] or 0)
-            total_losses = (home_stats['losses'] or 0) + (away_stats['losses'] or 0)
-            total_matches = total_wins + total_draws + total_losses
-            goals_for = (home_stats['goals_for'] or 0) + (away_stats['goals_for'] or 0)
-            goals_against = (home_stats['goals_against'] or 0) + (away_stats['goals_against'] or 0)
-            
-            standings.append({
-                'id': team.id,
-                'name': team.name,
-                'matches_played': total_matches,
-                'wins': total_wins,
-                'draws': total_draws,
-                'losses': total_losses,
-                'goals_for': goals_for,
-                'goals_against': goals_against,
-                'goal_difference': goals_for - goals_against,
-                'points': (total_wins * 3) + total_draws
-            })
-        
-        return sorted(standings, key=lambda x: (-x['points'], -x['goal_difference'], -x['goals_for']))
+        return compute_standings(obj.id, self.context.get('season'))
 
     def get_top_scorers(self, obj):
         return TopScorer.objects.filter(competition=obj) \
@@ -360,25 +317,21 @@ class CompetitionAnalyticsSerializer(serializers.ModelSerializer):
             .order_by('-goals')[:10]
 
     def get_goals_per_matchday(self, obj):
-        matches = Match.objects.filter(competition=obj).order_by('match_date')
+        options = self.context.get('series') or {'bucket': 'matchday', 'max_points': None, 'downsample': 'lttb'}
         goals_data = []
         total_goals = 0
         total_matches = 0
-        
-        for match in matches:
-            if match.home_team_score is not None and match.away_team_score is not None:
-                match_goals = match.home_team_score + match.away_team_score
-                total_goals += match_goals
-                total_matches += 1
-                average = round(total_goals / total_matches if total_matches > 0 else 0, 2)
-                
-                goals_data.append({
-                    'matchday': total_matches,
-                    'goals': match_goals,
-                    'average': average
-                })
-        
-        return goals_data
+
+        for period, goals, matches in goals_by_bucket(Match.objects.filter(competition=obj), options['bucket']):
+            total_goals += goals
+            total_matches += matches
+            goals_data.append({
+                'matchday': total_matches if options['bucket'] == 'matchday' else period.strftime('%Y-%m-%d'),
+                'goals': goals,
+                'average': round(total_goals / total_matches, 2)
+            })
+
+        return downsample(goals_data, options)
 
     def get_records(self, obj):
         matches = Match.objects.filter(competition=obj)
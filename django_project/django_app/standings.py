@@ -0,0 +1,112 @@
+"""
+League tables computed in the database.
+
+A table is one grouped query whatever the number of teams: the team season
+aggregates maintained by the Spark streaming stage when there are any,
+otherwise the finished matches, each seen once from the home side and once
+from the away side (UNION ALL) and summed per team with conditional sums.
+"""
+from django.db import connection
+from django.db.models import Sum
+
+from .models import TeamSeasonAggregate
+
+MATCH_STANDINGS_SQL = """
+    SELECT r.team_id, t.name, t.crest,
+           SUM(CASE WHEN r.goals_for > r.goals_against THEN 1 ELSE 0 END) AS wins,
+           SUM(CASE WHEN r.goals_for = r.goals_against THEN 1 ELSE 0 END) AS draws,
+           SUM(CASE WHEN r.goals_for < r.goals_against THEN 1 ELSE 0 END) AS losses,
+           SUM(r.goals_for) AS goals_for,
+           SUM(r.goals_against) AS goals_against
+    FROM (
+        SELECT home_team_id AS team_id, home_team_score AS goals_for, away_team_score AS goals_against
+        FROM matches WHERE {home_filter}
+        UNION ALL
+        SELECT away_team_id AS team_id, away_team_score AS goals_for, home_team_score AS goals_against
+        FROM matches WHERE {away_filter}
+    ) r
+    LEFT JOIN teams t ON t.id = r.team_id
+    GROUP BY r.team_id, t.name, t.crest
+    ORDER BY 3 * SUM(CASE WHEN r.goals_for > r.goals_against THEN 1 ELSE 0 END)
+                 + SUM(CASE WHEN r.goals_for = r.goals_against THEN 1 ELSE 0 END) DESC,
+             SUM(r.goals_for) - SUM(r.goals_against) DESC,
+             SUM(r.goals_for) DESC
+"""
+
+
+def _line(team_id, name, crest, wins, draws, losses, goals_for, goals_against) -> dict:
+    wins, draws, losses = int(wins or 0), int(draws or 0), int(losses or 0)
+    goals_for, goals_against = int(goals_for or 0), int(goals_against or 0)
+    return {
+        'id': team_id,
+        'name': name,
+        'crest': crest,
+        'matches_played': wins + draws + losses,
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'goals_for': goals_for,
+        'goals_against': goals_against,
+        'goal_difference': goals_for - goals_against,
+        'points': (wins * 3) + draws
+    }
+
+
+def _match_filter(team_column: str, competition_id, season, team_ids):
+    conditions = ["status = 'FINISHED'", "home_team_score IS NOT NULL", "away_team_score IS NOT NULL",
+                  f"{team_column} IS NOT NULL"]
+    params = []
+    if competition_id is not None:
+        conditions.append("competition_id = %s")
+        params.append(competition_id)
+    if season is not None:
+        conditions.append("season = %s")
+        params.append(str(season))
+    if team_ids:
+        conditions.append(f"{team_column} IN ({', '.join(['%s'] * len(team_ids))})")
+        params.extend(team_ids)
+    return " AND ".join(conditions), params
+
+
+def standings_from_matches(competition_id=None, season=None, team_ids=None) -> list:
+    """Table lines computed from the finished matches, in one query."""
+    home_filter, home_params = _match_filter("home_team_id", competition_id, season, team_ids)
+    away_filter, away_params = _match_filter("away_team_id", competition_id, season, team_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(MATCH_STANDINGS_SQL.format(home_filter=home_filter, away_filter=away_filter),
+                       home_params + away_params)
+        return [_line(*row) for row in cursor.fetchall()]
+
+
+def standings_from_aggregates(competition_id=None, season=None, team_ids=None) -> list:
+    """Table lines summed from the team season aggregates, in one query."""
+    aggregates = TeamSeasonAggregate.objects.filter(team__isnull=False)
+    if competition_id is not None:
+        aggregates = aggregates.filter(competition_id=competition_id)
+    if season is not None:
+        aggregates = aggregates.filter(season=str(season))
+    if team_ids:
+        aggregates = aggregates.filter(team_id__in=team_ids)
+    rows = aggregates.values('team_id', 'team__name', 'team__crest').annotate(
+        wins=Sum('won'),
+        draws=Sum('draw'),
+        losses=Sum('lost'),
+        goals_for=Sum('goals_for'),
+        goals_against=Sum('goals_against')
+    )
+    lines = [_line(row['team_id'], row['team__name'], row['team__crest'], row['wins'], row['draws'],
+                   row['losses'], row['goals_for'], row['goals_against']) for row in rows]
+    return sorted(lines, key=lambda x: (-x['points'], -x['goal_difference'], -x['goals_for']))
+
+
+def compute_standings(competition_id=None, season=None, team_ids=None) -> list:
+    """
+    Table of a competition (all seasons unless ``season`` is given), or the
+    records of ``team_ids`` across competitions, best first with positions.
+    Two queries at most, one when the aggregates are there.
+    """
+    lines = standings_from_aggregates(competition_id, season, team_ids) or \
+        standings_from_matches(competition_id, season, team_ids)
+    for position, line in enumerate(lines, start=1):
+        line['position'] = position
+    return lines
@@ -0,0 +1,234 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.db.models import F
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase
+
+from .models import Competition, DataVersion, Match, Team, TeamSeasonAggregate
+from .serializers import CompetitionAnalyticsSerializer
+from .standings import compute_standings
+from .timeseries import lttb, mean_downsample, series_options
+
+
+class ResultsTestCase(TestCase):
+    """Four teams, five finished matches and a scheduled one in a competition season."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.competition = Competition.objects.create(name='League')
+        cls.teams = [Team.objects.create(name=f'Team {i}') for i in range(4)]
+        home, away, third, fourth = cls.teams
+        results = [
+            (home, away, 2, 0),
+            (away, third, 1, 1),
+            (third, home, 0, 3),
+            (fourth, away, 1, 2),
+            (home, fourth, 1, 1),
+        ]
+        for day, (home_team, away_team, home_score, away_score) in enumerate(results, start=1):
+            Match.objects.create(
+                competition=cls.competition, season='2024', status='FINISHED', match_date=date(2024, 8, day),
+                home_team=home_team, away_team=away_team,
+                home_team_score=home_score, away_team_score=away_score
+            )
+        # not finished, left out of the table
+        Match.objects.create(competition=cls.competition, season='2024', status='SCHEDULED',
+                             home_team=away, away_team=home, home_team_score=None, away_team_score=None)
+
+    def setUp(self):
+        # analytics responses are cached across tests otherwise
+        cache.clear()
+
+    def add_aggregates(self):
+        for team, won, draw, lost, goals_for, goals_against in [
+            (self.teams[0], 2, 1, 0, 6, 1),
+            (self.teams[1], 1, 1, 1, 3, 4),
+        ]:
+            TeamSeasonAggregate.objects.create(
+                team=team, competition=self.competition, season='2024', played_games=won + draw + lost,
+                won=won, draw=draw, lost=lost, points=3 * won + draw,
+                goals_for=goals_for, goals_against=goals_against, goal_difference=goals_for - goals_against
+            )
+
+
+class StandingsQueryCountTests(ResultsTestCase):
+    """League tables cost a fixed number of queries, whatever the number of teams and matches."""
+
+    def test_fallback_to_matches(self):
+        # one empty aggregates query, then the table from the matches
+        with self.assertNumQueries(2):
+            table = compute_standings(self.competition.id)
+        self.assertEqual(
+            [(line['id'], line['points'], line['matches_played'], line['goal_difference']) for line in table],
+            [(self.teams[0].id, 7, 3, 5), (self.teams[1].id, 4, 3, -1),
+             (self.teams[3].id, 1, 2, -1), (self.teams[2].id, 1, 2, -3)]
+        )
+        self.assertEqual([line['position'] for line in table], [1, 2, 3, 4])
+
+    def test_aggregates(self):
+        self.add_aggregates()
+        with self.assertNumQueries(1):
+            table = compute_standings(self.competition.id, '2024')
+        self.assertEqual([(line['id'], line['points'], line['goal_difference']) for line in table],
+                         [(self.teams[0].id, 7, 5), (self.teams[1].id, 4, -1)])
+
+    def test_team_records(self):
+        with self.assertNumQueries(2):
+            records = compute_standings(team_ids=[self.teams[0].id, self.teams[2].id])
+        self.assertEqual([(line['id'], line['wins'], line['draws'], line['losses']) for line in records],
+                         [(self.teams[0].id, 2, 1, 0), (self.teams[2].id, 0, 1, 1)])
+
+    def test_competition_analytics_standings(self):
+        serializer = CompetitionAnalyticsSerializer(self.competition, context={'season': '2024'})
+        with self.assertNumQueries(2):
+            self.assertEqual(len(serializer.get_standings(self.competition)), 4)
+        self.add_aggregates()
+        with self.assertNumQueries(1):
+            self.assertEqual(len(serializer.get_standings(self.competition)), 2)
+
+    def test_standing_table_view(self):
+        url = f'/api/standings/table/?competition={self.competition.id}'
+        # data versions for the ETag, the competition, then the table
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([line['points'] for line in response.json()], [7, 4, 1, 1])
+        self.add_aggregates()
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual([line['points'] for line in response.json()], [7, 4])
+
+
+class TeamAnalyticsTests(ResultsTestCase):
+    """Match by match performance, with the summary from the aggregates when there are any."""
+
+    def test_fallback_to_matches(self):
+        response = self.client.get(f'/api/analytics/team/{self.teams[0].id}/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([match['result'] for match in data['performance']], ['W', 'W', 'D'])
+        self.assertEqual(data['seasons'], [])
+        self.assertEqual(data['summary']['points'], 7)
+        self.assertEqual(data['summary']['goal_difference'], 5)
+        self.assertEqual(data['performance'][-1]['running_points'], data['summary']['points'])
+
+    def test_aggregates(self):
+        self.add_aggregates()
+        # data versions, the team, the matches, then the aggregates
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/analytics/team/{self.teams[1].id}/')
+        data = response.json()
+        # still one entry per match, with the opponent and the score
+        self.assertEqual([(match['opponent'], match['score']) for match in data['performance']],
+                         [('Team 0', '0-2'), ('Team 2', '1-1'), ('Team 3', '2-1')])
+        self.assertEqual(len(data['seasons']), 1)
+        self.assertEqual((data['summary']['total_matches'], data['summary']['points']), (3, 4))
+
+    def test_missing_team(self):
+        self.assertEqual(self.client.get('/api/analytics/team/999999/').status_code, 404)
+
+
+class DownsamplingTests(SimpleTestCase):
+    """Series reduced to at most ``max_points`` points."""
+
+    points = [{'matchday': f'2024-08-{day:02}', 'goals': goals} for day, goals in
+              enumerate([1, 3, 0, 7, 2, 2, 1, 0, 9, 4, 3, 1], start=1)]
+
+    def test_lttb_keeps_first_last_and_peaks(self):
+        sampled = lttb(self.points, 5, lambda point: point['goals'])
+        self.assertEqual(len(sampled), 5)
+        self.assertEqual((sampled[0], sampled[-1]), (self.points[0], self.points[-1]))
+        goals = [point['goals'] for point in sampled]
+        self.assertIn(7, goals)
+        self.assertIn(9, goals)
+        # points are picked, never made up, and stay in order
+        self.assertEqual(sampled, sorted(sampled, key=self.points.index))
+
+    def test_lttb_short_series_untouched(self):
+        self.assertEqual(lttb(self.points, len(self.points), lambda point: point['goals']), self.points)
+        self.assertEqual(lttb(self.points, 2, lambda point: point['goals']), self.points)
+
+    def test_mean_downsample(self):
+        sampled = mean_downsample(self.points, 4)
+        self.assertEqual(len(sampled), 4)
+        self.assertEqual([point['matchday'] for point in sampled],
+                         ['2024-08-01', '2024-08-04', '2024-08-07', '2024-08-10'])
+        self.assertEqual([point['goals'] for point in sampled], [1.33, 3.67, 3.33, 2.67])
+        self.assertEqual(mean_downsample(self.points, 20), self.points)
+
+    def test_series_options(self):
+        self.assertEqual(series_options(QueryDict(''), default_bucket='day'),
+                         {'bucket': 'day', 'max_points': None, 'downsample': 'lttb'})
+        self.assertEqual(series_options(QueryDict('bucket=week&max_points=10&downsample=mean'), 'day'),
+                         {'bucket': 'week', 'max_points': 10, 'downsample': 'mean'})
+        for query in ['bucket=year', 'max_points=2', 'max_points=5001', 'max_points=-5', 'max_points=ten',
+                      'downsample=median']:
+            with self.subTest(query=query), self.assertRaises(ValueError):
+                series_options(QueryDict(query), default_bucket='day')
+
+
+class GoalsSeriesTests(ResultsTestCase):
+    """Goals trends of the analytics endpoints, bucketed and downsampled on request."""
+
+    def test_overview_goals_trend(self):
+        response = self.client.get('/api/analytics/overview/')
+        self.assertEqual([point['goals'] for point in response.json()['goals_trend']], [2, 2, 3, 3, 2])
+        response = self.client.get('/api/analytics/overview/?max_points=3')
+        trend = response.json()['goals_trend']
+        self.assertEqual([point['matchday'] for point in trend], ['2024-08-01', '2024-08-03', '2024-08-05'])
+
+    def test_invalid_series_parameters(self):
+        for url in ['/api/analytics/overview/', f'/api/analytics/competition/{self.competition.id}/']:
+            for query in ['bucket=year', 'max_points=1', 'downsample=median']:
+                with self.subTest(url=url, query=query):
+                    response = self.client.get(f'{url}?{query}')
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('error', response.json())
+
+
+class ResponseCacheTests(ResultsTestCase):
+    """Analytics responses are served from the cache until their data version is bumped."""
+
+    def bump(self, scope, scope_id):
+        version, _ = DataVersion.objects.get_or_create(scope=scope, scope_id=scope_id)
+        DataVersion.objects.filter(pk=version.pk).update(version=F('version') + 1)
+
+    def test_cached_until_data_version_bump(self):
+        url = f'/api/analytics/team/{self.teams[0].id}/'
+        self.assertEqual(self.client.get(url).json()['seasons'], [])
+        self.add_aggregates()
+        # same data version: the cached response, after the version lookup alone
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['seasons'], [])
+        # another team's writes leave it cached
+        self.bump(DataVersion.TEAM, self.teams[1].id)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).json()['seasons'], [])
+        self.bump(DataVersion.TEAM, self.teams[0].id)
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()['seasons']), 1)
+
+
+class ConditionalGetTests(ResultsTestCase):
+    """Responses carry a data version ETag; a matching If-None-Match gets a 304 before the view runs."""
+
+    def test_not_modified_until_data_version_bump(self):
+        url = '/api/dashboard/stats/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        # the data version lookup only
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", {etag}').status_code, 304)
+        # another URL, another ETag
+        self.assertNotEqual(self.client.get('/api/dashboard/top-scorers/')['ETag'], etag)
+        DataVersion.objects.create(scope=DataVersion.GLOBAL, scope_id=0, version=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,99 @@
+"""
+Goals time series for the analytics charts: bucketed by date in the
+database, then downsampled to at most ``max_points`` points, so a
+multi-season series stays the size a chart can show.
+"""
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+# one point per match, or per match date, ISO week or month
+BUCKETS = ['matchday', 'day', 'week', 'month']
+DOWNSAMPLING = ['lttb', 'mean']
+MAX_POINTS_LIMIT = 5000
+
+
+def series_options(query_params, default_bucket: str) -> dict:
+    """``bucket``, ``max_points`` and ``downsample`` request parameters; raises ValueError when invalid."""
+    bucket = query_params.get('bucket') or default_bucket
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    max_points = query_params.get('max_points')
+    if max_points is not None:
+        if not max_points.isdigit() or not 3 <= int(max_points) <= MAX_POINTS_LIMIT:
+            raise ValueError(f"max_points must be a number between 3 and {MAX_POINTS_LIMIT}")
+        max_points = int(max_points)
+    method = query_params.get('downsample') or 'lttb'
+    if method not in DOWNSAMPLING:
+        raise ValueError(f"downsample must be one of {', '.join(DOWNSAMPLING)}")
+    return {'bucket': bucket, 'max_points': max_points, 'downsample': method}
+
+
+def goals_by_bucket(matches, bucket: str) -> list:
+    """``(date, goals, matches)`` per bucket of the scored matches in ``matches``, oldest first."""
+    matches = matches.filter(
+        match_date__isnull=False,
+        home_team_score__isnull=False,
+        away_team_score__isnull=False
+    )
+    goals = F('home_team_score') + F('away_team_score')
+    if bucket == 'matchday':
+        return [(match_date, match_goals, 1) for match_date, match_goals in
+                matches.annotate(goals=goals).order_by('match_date', 'id').values_list('match_date', 'goals')]
+    period = {'day': F('match_date'), 'week': TruncWeek('match_date'), 'month': TruncMonth('match_date')}[bucket]
+    return list(
+        matches.annotate(period=period).values('period')
+        .annotate(goals=Sum(goals), matches=Count('id'))
+        .order_by('period')
+        .values_list('period', 'goals', 'matches')
+    )
+
+
+def lttb(points: list, max_points: int, value) -> list:
+    """
+    Largest-triangle-three-buckets: keeps the first and last points and, from
+    each of ``max_points - 2`` buckets in between, the point forming the
+    largest triangle with the point kept before it and the mean of the next
+    bucket. Peaks and troughs survive, unlike with averaging.
+    """
+    if max_points >= len(points) or max_points < 3:
+        return points
+    sampled = [points[0]]
+    every = (len(points) - 2) / (max_points - 2)
+    kept = 0
+    for i in range(max_points - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, len(points))
+        next_x = (next_start + next_end - 1) / 2
+        next_y = sum(value(point) for point in points[next_start:next_end]) / (next_end - next_start)
+        kept_y = value(points[kept])
+        kept = max(range(start, end), key=lambda j: abs(
+            (kept - next_x) * (value(points[j]) - kept_y) - (kept - j) * (next_y - kept_y)
+        ))
+        sampled.append(points[kept])
+    sampled.append(points[-1])
+    return sampled
+
+
+def mean_downsample(points: list, max_points: int) -> list:
+    """Averages consecutive runs of points down to ``max_points``; each keeps the labels of its first point."""
+    if max_points >= len(points):
+        return points
+    sampled = []
+    every = len(points) / max_points
+    for i in range(max_points):
+        group = points[int(i * every):int((i + 1) * every)]
+        point = dict(group[0])
+        for key, first in group[0].items():
+            if isinstance(first, (int, float)) and not isinstance(first, bool) and key != 'matchday':
+                point[key] = round(sum(p[key] for p in group) / len(group), 2)
+        sampled.append(point)
+    return sampled
+
+
+def downsample(points: list, options: dict, value_key: str = 'goals') -> list:
+    """Points reduced to ``options['max_points']`` with the requested method, untouched without a limit."""
+    if not options['max_points']:
+        return points
+    if options['downsample'] == 'mean':
+        return mean_downsample(points, options['max_points'])
+    return lttb(points, options['max_points'], lambda point: point[value_key])
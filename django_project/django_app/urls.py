@@ -25,6 +25,7 @@ urlpatterns = [
 
     # Standings
     path('standings/', views.StandingListView.as_view(), name='standing-list'),
+    path('standings/table/', views.StandingTableView.as_view(), name='standing-table'),
     path('standings/<int:pk>/', views.StandingDetailView.as_view(), name='standing-detail'),
 
     # Analytics endpoints
@@ -3,7 +3,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import generics, status
 from rest_framework.pagination import PageNumberPagination
-from .models import Team, Competition, Match, TopScorer, Player, Area, Standing
+from .models import Team, Competition, Match, TopScorer, Player, Area, Standing, TeamSeasonAggregate
 from .serializers import (
     TeamSerializer,
     CompetitionSerializer,
@@ -16,11 +16,24 @@ from .serializers import (
     PlayerAnalyticsSerializer,
     StandingSerializer
 )
+from .cache import (
+    by_data_version,
+    cached_by_data_version,
+    competition_scope,
+    global_scope,
+    match_scope,
+    player_scope,
+    team_comparison_scope,
+    team_scope,
+)
+from .standings import compute_standings
+from .timeseries import downsample, goals_by_bucket, series_options
 from django.db import connection
 from django.db import models
 from django.shortcuts import get_object_or_404
 
 class DashboardStatsView(APIView):
+    @by_data_version(global_scope)
     def get(self, request):
         try:
             # Get total counts
@@ -54,6 +67,7 @@ class DashboardStatsView(APIView):
             )
 
 class DashboardMatchesView(APIView):
+    @by_data_version(global_scope)
     def get(self, request):
         try:
             recent_matches = Match.objects.select_related(
@@ -71,6 +85,7 @@ class DashboardMatchesView(APIView):
             )
 
 class DashboardScorersView(APIView):
+    @by_data_version(global_scope)
     def get(self, request):
         try:
             top_scorers = TopScorer.objects.select_related(
@@ -98,6 +113,7 @@ class MatchPagination(PageNumberPagination):
 class MatchListView(APIView):
     pagination_class = MatchPagination
 
+    @by_data_version(global_scope)
     def get(self, request):
         try:
             # Get query parameters
@@ -151,6 +167,10 @@ class MatchDetailView(generics.RetrieveAPIView):
     queryset = Match.objects.all()
     serializer_class = MatchSerializer
 
+    @by_data_version(global_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 class TeamPagination(PageNumberPagination):
     page_size = 12
     page_size_query_param = 'page_size'
@@ -168,6 +188,7 @@ class TeamPagination(PageNumberPagination):
 class TeamListView(APIView):
     pagination_class = TeamPagination
 
+    @by_data_version(global_scope)
     def get(self, request):
         try:
             # Get query parameters
@@ -239,23 +260,44 @@ class TeamDetailView(generics.RetrieveAPIView):
     queryset = Team.objects.select_related('area').all()
     serializer_class = TeamSerializer
 
+    @by_data_version(global_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 class PlayerListView(generics.ListAPIView):
     queryset = Player.objects.all()
     serializer_class = PlayerSerializer
 
+    @by_data_version(global_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 class PlayerDetailView(generics.RetrieveAPIView):
     queryset = Player.objects.all()
     serializer_class = PlayerSerializer
 
+    @by_data_version(global_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 class CompetitionListView(generics.ListAPIView):
     queryset = Competition.objects.all()
     serializer_class = CompetitionSerializer
 
+    @by_data_version(global_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 class CompetitionDetailView(generics.RetrieveAPIView):
     queryset = Competition.objects.all()
     serializer_class = CompetitionSerializer
 
+    @by_data_version(global_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 class MatchPredictionsView(APIView):
+    @by_data_version(global_scope)
     def get(self, request):
         match_id = request.query_params.get('match_id')
         # Mocked predictions; replace with actual logic
@@ -268,49 +310,61 @@ class MatchPredictionsView(APIView):
         return Response(predictions)
 
 class AnalyticsOverviewView(APIView):
+    @cached_by_data_version(global_scope)
     def get(self, request):
         try:
-            # Get match statistics
-            total_matches = Match.objects.count()
-            finished_matches = Match.objects.filter(status='FINISHED').count()
-            scheduled_matches = Match.objects.filter(status='SCHEDULED').count()
+            options = series_options(request.query_params, default_bucket='day')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Get match statistics and goals in one pass over the matches
+            finished = Q(status='FINISHED')
+            match_goals = F('home_team_score') + F('away_team_score')
+            match_stats = Match.objects.aggregate(
+                total_matches=Count('id'),
+                finished_matches=Count('id', filter=finished),
+                scheduled_matches=Count('id', filter=Q(status='SCHEDULED')),
+                total_goals=Sum(match_goals, filter=finished, default=0)
+            )
+            total_matches = match_stats['total_matches']
+            finished_matches = match_stats['finished_matches']
+            scheduled_matches = match_stats['scheduled_matches']
             other_matches = total_matches - (finished_matches + scheduled_matches)
-
-            # Get goals statistics
-            matches = Match.objects.filter(status='FINISHED')
-            total_goals = sum([m.home_team_score + m.away_team_score for m in matches if m.home_team_score is not None and m.away_team_score is not None])
+            total_goals = match_stats['total_goals']
             avg_goals = round(total_goals / finished_matches if finished_matches > 0 else 0, 2)
 
-            # Get goals trend
-            goals_trend = []
-            for match in matches.order_by('match_date'):
-                if match.home_team_score is not None and match.away_team_score is not None:
-                    match_goals = match.home_team_score + match.away_team_score
-                    goals_trend.append({
-                        'matchday': match.match_date.strftime('%Y-%m-%d'),
-                        'goals': match_goals,
-                        'average_goals': match_goals
-                    })
-
-            # Get scorer statistics
-            scorer_stats = []
-            top_scorers = TopScorer.objects.all()
-            
-            # Get goals range distribution
+            # Get goals trend, one point per bucket (match date by default), downsampled on request
+            goals_trend = downsample([{
+                'matchday': period.strftime('%Y-%m-%d'),
+                'goals': goals,
+                'average_goals': round(goals / matches, 2)
+            } for period, goals, matches in goals_by_bucket(Match.objects.filter(finished), options['bucket'])],
+                options)
+
+            # Get goals range distribution and performance metrics in one query
+            scorer_counts = TopScorer.objects.aggregate(
+                goals_20_plus=Count('id', filter=Q(goals__gte=20)),
+                goals_15_19=Count('id', filter=Q(goals__range=(15, 19))),
+                goals_10_14=Count('id', filter=Q(goals__range=(10, 14))),
+                goals_5_9=Count('id', filter=Q(goals__range=(5, 9))),
+                goals_1_4=Count('id', filter=Q(goals__range=(1, 4))),
+                high_impact=Count('id', filter=Q(goals__gte=10, assists__gte=5)),
+                pure_scorer=Count('id', filter=Q(goals__gte=10, assists__lt=5)),
+                playmaker=Count('id', filter=Q(goals__lt=10, assists__gte=5)),
+                regular=Count('id', filter=Q(goals__lt=10, assists__lt=5))
+            )
             goals_ranges = {
-                '20+ goals': top_scorers.filter(goals__gte=20).count(),
-                '15-19 goals': top_scorers.filter(goals__range=(15, 19)).count(),
-                '10-14 goals': top_scorers.filter(goals__range=(10, 14)).count(),
-                '5-9 goals': top_scorers.filter(goals__range=(5, 9)).count(),
-                '1-4 goals': top_scorers.filter(goals__range=(1, 4)).count(),
+                '20+ goals': scorer_counts['goals_20_plus'],
+                '15-19 goals': scorer_counts['goals_15_19'],
+                '10-14 goals': scorer_counts['goals_10_14'],
+                '5-9 goals': scorer_counts['goals_5_9'],
+                '1-4 goals': scorer_counts['goals_1_4'],
             }
-
-            # Get performance metrics
             performance_stats = {
-                'High Impact': top_scorers.filter(goals__gte=10, assists__gte=5).count(),
-                'Pure Scorer': top_scorers.filter(goals__gte=10, assists__lt=5).count(),
-                'Playmaker': top_scorers.filter(goals__lt=10, assists__gte=5).count(),
-                'Regular': top_scorers.filter(goals__lt=10, assists__lt=5).count(),
+                'High Impact': scorer_counts['high_impact'],
+                'Pure Scorer': scorer_counts['pure_scorer'],
+                'Playmaker': scorer_counts['playmaker'],
+                'Regular': scorer_counts['regular'],
             }
 
             response_data = {
@@ -345,130 +399,43 @@ class AnalyticsOverviewView(APIView):
             return Response({'error': str(e)}, status=500)
 
 class TeamAnalyticsView(APIView):
+    @cached_by_data_version(team_scope)
     def get(self, request, team_id):
+        team = get_object_or_404(Team, id=team_id)
         try:
-            print(f"\n=== TeamAnalyticsView ===")
-            print(f"Request method: {request.method}")
-            print(f"Request path: {request.path}")
-            print(f"Team ID: {team_id}")
-            
-            # Verify team exists
-            team = get_object_or_404(Team, id=team_id)
-            print(f"Found team: {team.name} (ID: {team.id})")
-            
-            # Get team's matches
-            matches = Match.objects.filter(
-                Q(home_team=team) | Q(away_team=team),
-                status='FINISHED'
-            ).order_by('match_date')
-            
-            match_count = matches.count()
-            print(f"Found {match_count} matches for team")
-            
-            if not matches.exists():
-                print("No matches found for team")
-                response_data = {
-                    'performance': [],
-                    'summary': {
-                        'total_matches': 0,
-                        'wins': 0,
-                        'draws': 0,
-                        'losses': 0,
-                        'goals_for': 0,
-                        'goals_against': 0,
-                        'goal_difference': 0,
-                        'points': 0,
-                        'average_points': 0
-                    }
+            performance = self.match_performance(team)
+            seasons = self.seasons(team)
+            # Prefer the totals maintained by the streaming aggregation when they exist
+            if seasons:
+                summary = {
+                    'total_matches': sum(season['played_games'] for season in seasons),
+                    'wins': sum(season['won'] for season in seasons),
+                    'draws': sum(season['draw'] for season in seasons),
+                    'losses': sum(season['lost'] for season in seasons),
+                    'goals_for': sum(season['goals_for'] for season in seasons),
+                    'goals_against': sum(season['goals_against'] for season in seasons),
+                    'points': sum(season['points'] for season in seasons),
                 }
-                print("Returning empty response:", response_data)
-                return Response(response_data)
-            
-            # Calculate performance metrics
-            performance = []
-            running_points = 0
-            total_matches = 0
-            wins = 0
-            draws = 0
-            losses = 0
-            goals_for = 0
-            goals_against = 0
-            
-            print("\nProcessing matches:")
-            for match in matches:
-                total_matches += 1
-                
-                # Determine if team was home or away
-                is_home = match.home_team == team
-                team_score = match.home_team_score if is_home else match.away_team_score
-                opponent_score = match.away_team_score if is_home else match.home_team_score
-                opponent = match.away_team if is_home else match.home_team
-                
-                # Handle None values
-                team_score = team_score or 0
-                opponent_score = opponent_score or 0
-                
-                print(f"Match {total_matches}: {team.name} vs {opponent.name} - Score: {team_score}-{opponent_score}")
-                
-                # Update statistics
-                goals_for += team_score
-                goals_against += opponent_score
-                
-                # Calculate match points
-                if team_score > opponent_score:
-                    points = 3
-                    wins += 1
-                    result = 'W'
-                elif team_score == opponent_score:
-                    points = 1
-                    draws += 1
-                    result = 'D'
-                else:
-                    points = 0
-                    losses += 1
-                    result = 'L'
-                
-                running_points += points
-                
-                match_data = {
-                    'match_date': match.match_date.strftime('%Y-%m-%d'),
-                    'opponent': opponent.name,
-                    'score': f"{team_score}-{opponent_score}",
-                    'result': result,
-                    'points': points,
-                    'running_points': running_points,
-                    'average_points': round(running_points / total_matches, 2)
+            else:
+                summary = {
+                    'total_matches': len(performance),
+                    'wins': sum(match['result'] == 'W' for match in performance),
+                    'draws': sum(match['result'] == 'D' for match in performance),
+                    'losses': sum(match['result'] == 'L' for match in performance),
+                    'goals_for': sum(match['goals_for'] for match in performance),
+                    'goals_against': sum(match['goals_against'] for match in performance),
+                    'points': performance[-1]['running_points'] if performance else 0,
                 }
-                print(f"Match data: {match_data}")
-                performance.append(match_data)
-            
-            response_data = {
+            summary['goal_difference'] = summary['goals_for'] - summary['goals_against']
+            summary['average_points'] = round(summary['points'] / summary['total_matches'], 2) \
+                if summary['total_matches'] > 0 else 0
+
+            return Response({
                 'performance': performance,
-                'summary': {
-                    'total_matches': total_matches,
-                    'wins': wins,
-                    'draws': draws,
-                    'losses': losses,
-                    'goals_for': goals_for,
-                    'goals_against': goals_against,
-                    'goal_difference': goals_for - goals_against,
-                    'points': running_points,
-                    'average_points': round(running_points / total_matches, 2) if total_matches > 0 else 0
-                }
-            }
-            
-            print("\nFinal response data:")
-            print("Summary:", response_data['summary'])
-            print(f"Performance entries: {len(response_data['performance'])}")
-            
-            return Response(response_data)
-            
-        except Team.DoesNotExist:
-            print(f"Team {team_id} not found")
-            return Response(
-                {'error': 'Team not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+                'seasons': seasons,
+                'summary': summary
+            })
+
         except Exception as e:
             print(f"Error in TeamAnalyticsView: {str(e)}")
             import traceback
@@ -478,19 +445,76 @@ class TeamAnalyticsView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @staticmethod
+    def seasons(team) -> list:
+        """The team's competition seasons from the TeamSeasonAggregate rows, oldest first; empty without any."""
+        return list(
+            TeamSeasonAggregate.objects.filter(team=team, played_games__gt=0)
+            .order_by(F('last_match_date').asc(nulls_first=True), 'season')
+            .values('season', 'competition_id', 'played_games', 'won', 'draw', 'lost',
+                    'goals_for', 'goals_against', 'points', 'form', 'last_match_date')
+        )
+
+    @staticmethod
+    def match_performance(team) -> list:
+        """One entry per finished match of the team, with the running points."""
+        performance = []
+        running_points = 0
+        matches = Match.objects.filter(
+            Q(home_team=team) | Q(away_team=team),
+            status='FINISHED'
+        ).select_related('home_team', 'away_team').order_by('match_date')
+        for match in matches:
+            # Determine if team was home or away
+            is_home = match.home_team_id == team.id
+            team_score = (match.home_team_score if is_home else match.away_team_score) or 0
+            opponent_score = (match.away_team_score if is_home else match.home_team_score) or 0
+            opponent = match.away_team if is_home else match.home_team
+
+            if team_score > opponent_score:
+                points, result = 3, 'W'
+            elif team_score == opponent_score:
+                points, result = 1, 'D'
+            else:
+                points, result = 0, 'L'
+            running_points += points
+
+            performance.append({
+                'match_date': match.match_date.strftime('%Y-%m-%d') if match.match_date else None,
+                'opponent': opponent.name if opponent else None,
+                'score': f"{team_score}-{opponent_score}",
+                'result': result,
+                'points': points,
+                'running_points': running_points,
+                'average_points': round(running_points / (len(performance) + 1), 2),
+                'goals_for': team_score,
+                'goals_against': opponent_score,
+            })
+        return performance
+
 class CompetitionAnalyticsView(APIView):
+    @cached_by_data_version(competition_scope)
     def get(self, request, competition_id):
         try:
             competition = Competition.objects.get(id=competition_id)
-            serializer = CompetitionAnalyticsSerializer(competition)
+            serializer = CompetitionAnalyticsSerializer(competition, context={
+                'season': request.query_params.get('season'),
+                'series': series_options(request.query_params, default_bucket='matchday')
+            })
             return Response(serializer.data)
         except Competition.DoesNotExist:
             return Response(
                 {"error": "Competition not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except ValueError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
 class MatchAnalyticsView(APIView):
+    @cached_by_data_version(match_scope)
     def get(self, request, match_id):
         try:
             match = Match.objects.get(id=match_id)
@@ -503,6 +527,7 @@ class MatchAnalyticsView(APIView):
             )
 
 class PlayerAnalyticsView(APIView):
+    @cached_by_data_version(player_scope)
     def get(self, request, player_id):
         try:
             player = Player.objects.get(id=player_id)
@@ -515,6 +540,7 @@ class PlayerAnalyticsView(APIView):
             )
 
 class TeamComparisonView(APIView):
+    @cached_by_data_version(team_comparison_scope)
     def get(self, request, team1_id, team2_id):
         try:
             team1 = Team.objects.get(id=team1_id)
@@ -549,6 +575,11 @@ class TeamComparisonView(APIView):
             team1_form = TeamAnalyticsSerializer().get_form_analysis(team1)
             team2_form = TeamAnalyticsSerializer().get_form_analysis(team2)
             
+            # Overall records of both teams, in one query
+            records = {line['id']: line for line in compute_standings(
+                season=request.query_params.get('season'), team_ids=[team1.id, team2.id]
+            )}
+
             # Get top scorers for both teams
             team1_scorers = TopScorer.objects.filter(team=team1).order_by('-goals')[:5]
             team2_scorers = TopScorer.objects.filter(team=team2).order_by('-goals')[:5]
@@ -564,6 +595,7 @@ class TeamComparisonView(APIView):
                 'team_comparison': {
                     team1.name: {
                         'form': team1_form,
+                        'record': records.get(team1.id),
                         'top_scorers': [
                             {
                                 'name': scorer.player.name,
@@ -574,6 +606,7 @@ class TeamComparisonView(APIView):
                     },
                     team2.name: {
                         'form': team2_form,
+                        'record': records.get(team2.id),
                         'top_scorers': [
                             {
                                 'name': scorer.player.name,
@@ -614,6 +647,27 @@ class StandingListView(generics.ListAPIView):
         # Order by position by default
         return queryset.order_by('position')
 
+    @by_data_version(global_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 class StandingDetailView(generics.RetrieveAPIView):
     queryset = Standing.objects.select_related('team', 'competition', 'area').all()
-    serializer_class = StandingSerializer
\ No newline at end of file
+    serializer_class = StandingSerializer
+
+    @by_data_version(global_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+class StandingTableView(APIView):
+    """League table computed from the results, for competitions or seasons without stored standings."""
+    @by_data_version(global_scope)
+    def get(self, request):
+        competition_id = request.query_params.get('competition')
+        if not competition_id or not competition_id.isdigit():
+            return Response(
+                {"error": "A numeric competition parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        competition = get_object_or_404(Competition, id=competition_id)
+        return Response(compute_standings(competition.id, request.query_params.get('season')))
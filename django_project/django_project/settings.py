@@ -49,11 +49,16 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'if-none-match',
     'origin',
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
 ]
+# readable by the polling client, which sends it back as If-None-Match
+CORS_EXPOSE_HEADERS = [
+    'etag',
+]
 
 # Twitter API Settings
 TWITTER_API_KEY = os.getenv('TWITTER_API_KEY', '')
@@ -115,10 +120,30 @@ DATABASES = {
         'USER': 'houcine',
         'PASSWORD': 'houcine',
         'HOST': 'localhost',  
-        'PORT': '3307',  
+        'PORT': '3307',
+    }
+}
+
+# Cache
+# Analytics responses are cached until the pooling service bumps the data
+# versions they depend on (django_app/cache.py); Redis shares the cache
+# between workers, the local memory cache is per process.
+
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
     }
 }
 
+# invalidation is by data version, the timeout only evicts entries nobody asks for
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_CACHE_TIMEOUT', 24 * 60 * 60))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -0,0 +1,108 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlparse
+
+import lz4.frame
+import zstandard
+
+from records import competition_records, team_records, match_records, match_record, scorer_records, standing_records
+# wire_format.py and schemas.json live in python-scripts/shared; the images copy them next to this file
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+from wire_format import FORMATS, SchemaRegistry, decode, encode
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "RESPONSE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".response_cache")
+)
+BATCH_SIZE = 64 * 1024
+
+COMPRESSORS = {
+    "none": lambda data: data,
+    "lz4": lz4.frame.compress,
+    "zstd": zstandard.ZstdCompressor().compress,
+}
+
+
+def load_recorded_messages(cache_dir: str) -> list:
+    """Rebuild the (topic, value) messages the producer sends from the responses in its cache."""
+    messages = []
+    for path in sorted(glob.glob(os.path.join(cache_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        url = urlparse(entry["url"])
+        body = entry["body"]
+        season = int(parse_qs(url.query).get("season", ["0"])[0])
+        if url.path.endswith("/competitions/"):
+            records = [("competitions-topic", value) for _, value in competition_records(body.get("competitions", []))]
+        elif url.path.endswith("/teams"):
+            records = [("teams-topic", value) for _, value in team_records(body, season)]
+        elif url.path.endswith("/scorers"):
+            records = [("top-scorers-topic", value) for _, value in scorer_records(body, season)]
+        elif url.path.endswith("/standings"):
+            records = [("standings-topic", value) for _, value in standing_records(body, season)]
+        elif url.path.endswith("/matches") and season:
+            records = [("matches-topic", value) for _, value in match_records(body, season)]
+        elif url.path.endswith("/matches"):
+            records = [("matches-topic", match_record(match)) for match in body.get("matches", [])]
+        else:
+            continue
+        messages.extend(records)
+    return messages
+
+
+def batched(encoded: list, batch_size: int):
+    """Group consecutive messages of a topic into producer-sized batches."""
+    batch, batch_topic, batch_bytes = [], None, 0
+    for topic, data in encoded:
+        if batch and (topic != batch_topic or batch_bytes + len(data) > batch_size):
+            yield b"".join(batch)
+            batch, batch_bytes = [], 0
+        batch.append(data)
+        batch_topic = topic
+        batch_bytes += len(data)
+    if batch:
+        yield b"".join(batch)
+
+
+def run(messages: list, registry: SchemaRegistry) -> None:
+    print(f"{len(messages)} messages\n")
+    print(f"{'format':<10}{'compression':<13}{'bytes':>14}{'ratio':>8}{'encode s':>11}{'decode s':>11}")
+    baseline = None
+    for format_name, content_type in FORMATS.items():
+        started_at = time.perf_counter()
+        encoded = []
+        for topic, value in messages:
+            data, headers = encode(topic, value, content_type, registry)
+            encoded.append((topic, data, headers))
+        encode_seconds = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        for topic, data, headers in encoded:
+            decode(topic, data, headers, registry)
+        decode_seconds = time.perf_counter() - started_at
+
+        for compression, compress in COMPRESSORS.items():
+            wire_bytes = sum(len(compress(batch)) for batch in batched([(t, d) for t, d, _ in encoded], BATCH_SIZE))
+            baseline = baseline or wire_bytes
+            print(f"{format_name:<10}{compression:<13}{wire_bytes:>14,}{wire_bytes / baseline:>8.2f}"
+                  f"{encode_seconds:>11.3f}{decode_seconds:>11.3f}")
+
+
+def main():
+    """Compare bytes on the wire and encode/decode time of the Kafka wire formats."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="producer response cache holding the recorded API responses")
+    args = parser.parse_args()
+
+    messages = load_recorded_messages(args.cache_dir)
+    if not messages:
+        raise SystemExit(f"No recorded responses found in {args.cache_dir}; run producer.py once to record some.")
+    run(messages, SchemaRegistry())
+
+
+if __name__ == "__main__":
+    main()
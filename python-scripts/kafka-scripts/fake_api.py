@@ -0,0 +1,328 @@
+"""
+Local stand-in for the football-data API, for load tests and end-to-end
+benchmarks that should not spend the real quota.
+
+Serves the endpoints the producer reads (``competitions/``, and the
+``teams``, ``matches``, ``scorers`` and ``standings`` of a competition
+season, plus the live ``matches`` window) from a synthetic dataset of
+configurable size, or replays the responses recorded in the producer's
+response cache. Latency and the per-minute quota, with its headers and 429s,
+are emulated, and ETags are answered with 304s like the real API.
+
+Point the producer at it with ``FOOTBALL_API_BASE_URL=http://<host>:8080/v4/``.
+The ``/_control`` endpoints are for the pipeline benchmark: ``stats`` tells
+what was served and what the pipeline should end up with, ``goal`` scores a
+goal in one of the live matches.
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import random
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
+from aiohttp import web
+
+BASE_PATH = "/v4/"
+
+# Synthetic ids start here, clear of the ids of the real API
+ID_OFFSET = 900000
+MATCH_ID_OFFSET = 900000000
+
+
+class SyntheticDataset:
+    """
+    ``competitions`` leagues of ``teams`` teams, each playing a double round
+    robin (capped at ``matches`` matches) in every season. Generated lazily
+    per competition season, deterministically from ``seed``.
+
+    The last ``live_matches`` matches of the latest season are dated today and
+    in play; they are what the live window returns and where goals are scored.
+    """
+
+    def __init__(self, competitions: int, seasons: list, teams: int, matches: int, live_matches: int, seed: int):
+        self.competitions = [self._competition(index) for index in range(competitions)]
+        self.by_code = {competition["code"]: competition for competition in self.competitions}
+        self.seasons = sorted(seasons)
+        self.teams = teams
+        self.matches_per_season = min(matches or teams * (teams - 1), teams * (teams - 1))
+        self.live_matches = live_matches
+        self.seed = seed
+        self._matches = {}
+
+    @staticmethod
+    def _competition(index: int) -> dict:
+        area = {"id": ID_OFFSET + index, "name": f"Area {index}", "code": f"A{index:02d}", "flag": None}
+        return {"id": ID_OFFSET + index, "name": f"Competition {index}", "code": f"F{index:02d}", "type": "LEAGUE",
+                "emblem": None, "area": area}
+
+    def _team(self, competition: dict, index: int) -> dict:
+        team_id = (competition["id"] - ID_OFFSET) * 1000 + ID_OFFSET + index
+        return {"id": team_id, "name": f"Team {team_id}", "shortName": f"T{team_id}", "tla": f"T{index:02d}",
+                "crest": None}
+
+    def _reference(self, competition: dict) -> dict:
+        return {key: competition[key] for key in ("id", "name", "code", "type", "emblem")}
+
+    def season_matches(self, competition: dict, season: int) -> list:
+        """The matches of a competition season, generated on first use and then kept (goals change them)."""
+        key = (competition["id"], season)
+        if key not in self._matches:
+            rng = random.Random(f"{self.seed}-{competition['id']}-{season}")
+            teams = [self._team(competition, index) for index in range(self.teams)]
+            fixtures = [(home, away) for home in teams for away in teams if home is not away][:self.matches_per_season]
+            live_from = len(fixtures) - self.live_matches if season == self.seasons[-1] and \
+                competition is self.competitions[0] else len(fixtures)
+            matches = []
+            for index, (home, away) in enumerate(fixtures):
+                live = index >= live_from
+                # spread over the ten months of the season
+                match_day = date.today() if live else date(season, 8, 1) + timedelta(days=index * 300 // len(fixtures))
+                goals = {"home": 0, "away": 0} if live else {"home": rng.randint(0, 4), "away": rng.randint(0, 3)}
+                matches.append({
+                    "id": MATCH_ID_OFFSET + ((competition["id"] - ID_OFFSET) * 100 + season % 100) * 10000 + index,
+                    "utcDate": f"{match_day.isoformat()}T15:00:00Z",
+                    "status": "IN_PLAY" if live else "FINISHED",
+                    "matchday": index // max(1, self.teams // 2) + 1,
+                    "stage": "REGULAR_SEASON",
+                    "group": None,
+                    "lastUpdated": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "area": competition["area"],
+                    "competition": self._reference(competition),
+                    "season": {"id": season, "startDate": f"{season}-08-01", "endDate": f"{season + 1}-05-31",
+                               "currentMatchday": None},
+                    "homeTeam": home,
+                    "awayTeam": away,
+                    "score": {"winner": None, "duration": "REGULAR", "fullTime": goals,
+                              "halfTime": {"home": goals["home"] // 2, "away": goals["away"] // 2}},
+                })
+            self._matches[key] = matches
+        return self._matches[key]
+
+    def live(self) -> list:
+        return [match for match in self.season_matches(self.competitions[0], self.seasons[-1])
+                if match["status"] == "IN_PLAY"]
+
+    def standings(self, competition: dict, season: int) -> list:
+        """The overall table of a competition season, from its finished matches."""
+        rows = {}
+        for match in self.season_matches(competition, season):
+            if match["status"] != "FINISHED":
+                continue
+            goals = match["score"]["fullTime"]
+            for team, scored, conceded in ((match["homeTeam"], goals["home"], goals["away"]),
+                                           (match["awayTeam"], goals["away"], goals["home"])):
+                row = rows.setdefault(team["id"], {"team": team, "playedGames": 0, "won": 0, "draw": 0, "lost": 0,
+                                                   "points": 0, "goalsFor": 0, "goalsAgainst": 0, "form": []})
+                result = "W" if scored > conceded else "D" if scored == conceded else "L"
+                row["playedGames"] += 1
+                row[{"W": "won", "D": "draw", "L": "lost"}[result]] += 1
+                row["points"] += {"W": 3, "D": 1, "L": 0}[result]
+                row["goalsFor"] += scored
+                row["goalsAgainst"] += conceded
+                row["form"] = [result] + row["form"][:4]
+        table = sorted(rows.values(), key=lambda r: (-r["points"], r["goalsAgainst"] - r["goalsFor"], -r["goalsFor"]))
+        for position, row in enumerate(table, start=1):
+            row.update(position=position, goalDifference=row["goalsFor"] - row["goalsAgainst"],
+                       form=",".join(row["form"]))
+        return table
+
+    def scorers(self, competition: dict, season: int) -> list:
+        rng = random.Random(f"{self.seed}-{competition['id']}-{season}-scorers")
+        scorers = []
+        for index in range(self.teams):
+            team = self._team(competition, index)
+            player_id = 2 * ID_OFFSET + team["id"] - ID_OFFSET
+            scorers.append({
+                "player": {"id": player_id, "name": f"Player {player_id}", "firstName": "Player",
+                           "lastName": str(player_id), "dateOfBirth": "1995-01-01", "nationality": "England",
+                           "section": "Offence", "position": "Centre-Forward"},
+                "team": team, "playedMatches": 2 * (self.teams - 1), "goals": rng.randint(0, 30),
+                "assists": rng.randint(0, 12), "penalties": rng.randint(0, 6),
+            })
+        return sorted(scorers, key=lambda scorer: -scorer["goals"])[:10]
+
+    def response(self, path: str, query_string: str):
+        """Body for an API path (relative to the base path), or None for a 404."""
+        query = parse_qs(query_string)
+        if path.rstrip("/") == "competitions":
+            return {"count": len(self.competitions), "competitions": self.competitions}
+        if path == "matches":
+            matches = self.live()
+            return {"resultSet": {"count": len(matches)}, "matches": matches}
+        parts = path.split("/")
+        if len(parts) != 3 or parts[0] != "competitions" or parts[1] not in self.by_code:
+            return None
+        competition, resource = self.by_code[parts[1]], parts[2]
+        season = int(query.get("season", [self.seasons[-1]])[0])
+        if season not in self.seasons:
+            return None
+        envelope = {"filters": {"season": str(season)}, "competition": self._reference(competition),
+                    "season": {"id": season, "startDate": f"{season}-08-01", "endDate": f"{season + 1}-05-31"}}
+        if resource == "teams":
+            teams = [{**self._team(competition, index), "address": None, "website": None, "founded": 1900,
+                      "clubColors": None, "venue": None, "area": competition["area"], "coach": None,
+                      "runningCompetitions": [self._reference(competition)]} for index in range(self.teams)]
+            return {**envelope, "count": len(teams), "teams": teams}
+        if resource == "matches":
+            matches = self.season_matches(competition, season)
+            return {**envelope, "resultSet": {"count": len(matches)}, "matches": matches}
+        if resource == "scorers":
+            return {**envelope, "scorers": self.scorers(competition, season)}
+        if resource == "standings":
+            return {**envelope, "area": competition["area"], "standings": [
+                {"stage": "REGULAR_SEASON", "type": "TOTAL", "group": None,
+                 "table": self.standings(competition, season)}
+            ]}
+        return None
+
+    def score_goal(self, match_id: int = None) -> dict:
+        """Score a goal in a live match (a random one by default); returns the new score and when it changed."""
+        live = self.live()
+        match = next((m for m in live if m["id"] == match_id), None) if match_id else random.choice(live)
+        if match is None:
+            raise KeyError(match_id)
+        side = random.choice(["home", "away"])
+        match["score"]["fullTime"][side] += 1
+        match["lastUpdated"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        goals = match["score"]["fullTime"]
+        return {"id": match["id"], "home": goals["home"], "away": goals["away"], "changed_at": time.time()}
+
+    def expected(self) -> dict:
+        """What MySQL should hold once the pipeline has synced everything served."""
+        return {"competition_ids": [competition["id"] for competition in self.competitions],
+                "matches": len(self.competitions) * len(self.seasons) * self.matches_per_season}
+
+
+class RecordedDataset:
+    """Responses recorded by the producer's response cache, replayed by path and query."""
+
+    def __init__(self, cache_dir: str):
+        self.responses = {}
+        for path in glob.glob(os.path.join(cache_dir, "*.json")):
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            url = urlparse(entry["url"])
+            relative = url.path.split(BASE_PATH, 1)[-1]
+            self.responses[f"{relative}?{url.query}" if url.query else relative] = entry["body"]
+
+    def response(self, path: str, query_string: str):
+        return self.responses.get(f"{path}?{query_string}" if query_string else path)
+
+    def score_goal(self, match_id: int = None) -> dict:
+        raise KeyError("recorded responses have no live matches")
+
+    def expected(self) -> dict:
+        competition_ids, matches = set(), 0
+        for key, body in self.responses.items():
+            if key.startswith("competitions/") and "/matches?" in key:
+                competition_ids.add((body.get("competition") or {}).get("id"))
+                matches += len(body.get("matches", []))
+        return {"competition_ids": sorted(competition_ids - {None}), "matches": matches}
+
+
+class FakeApi:
+    """Serves a dataset with emulated latency, quota and conditional requests."""
+
+    def __init__(self, dataset, latency_ms: float, jitter_ms: float, rate_limit: int):
+        self.dataset = dataset
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.served = deque()
+        self.stats = {"requests": 0, "not_modified": 0, "rate_limited": 0, "not_found": 0,
+                      "first_request_at": None, "last_request_at": None}
+
+    def quota_headers(self, now: float) -> dict:
+        while self.served and now - self.served[0] >= 60:
+            self.served.popleft()
+        if not self.rate_limit:
+            return {}
+        reset = 60 - (now - self.served[0]) if self.served else 60
+        return {"X-Requests-Available-Minute": str(max(0, self.rate_limit - len(self.served))),
+                "X-RequestCounter-Reset": str(int(reset) + 1)}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        now = time.time()
+        self.stats["requests"] += 1
+        self.stats["first_request_at"] = self.stats["first_request_at"] or now
+        self.stats["last_request_at"] = now
+        headers = self.quota_headers(now)
+        if self.rate_limit and len(self.served) >= self.rate_limit:
+            self.stats["rate_limited"] += 1
+            return web.json_response({"message": "You reached your request limit."}, status=429,
+                                     headers={**headers, "Retry-After": headers["X-RequestCounter-Reset"]})
+        self.served.append(now)
+        headers = self.quota_headers(now)
+
+        if self.latency_ms or self.jitter_ms:
+            await asyncio.sleep(max(0.0, random.uniform(self.latency_ms - self.jitter_ms,
+                                                        self.latency_ms + self.jitter_ms)) / 1000)
+
+        body = self.dataset.response(request.match_info["path"], request.query_string)
+        if body is None:
+            self.stats["not_found"] += 1
+            return web.json_response({"message": "The resource you are looking for does not exist."}, status=404,
+                                     headers=headers)
+        data = json.dumps(body).encode("utf-8")
+        etag = f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers={**headers, "ETag": etag})
+        return web.Response(body=data, content_type="application/json", headers={**headers, "ETag": etag})
+
+    async def control_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "expected": self.dataset.expected()})
+
+    async def control_goal(self, request: web.Request) -> web.Response:
+        match_id = request.query.get("match_id")
+        try:
+            return web.json_response(self.dataset.score_goal(int(match_id) if match_id else None))
+        except (KeyError, IndexError) as e:
+            return web.json_response({"message": f"No live match to score in: {e}"}, status=404)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/_control/stats", self.control_stats)
+        app.router.add_post("/_control/goal", self.control_goal)
+        app.router.add_get(BASE_PATH + "{path:.*}", self.handle)
+        return app
+
+
+def main():
+    """Serve synthetic or recorded football-data API responses locally."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_API_PORT", "8080")))
+    parser.add_argument("--competitions", type=int, default=12)
+    parser.add_argument("--seasons", default="2022,2023,2024", help="comma separated; other seasons are 404s")
+    parser.add_argument("--teams", type=int, default=20, help="teams per competition")
+    parser.add_argument("--matches", type=int, default=0,
+                        help="matches per competition season (default: a full double round robin)")
+    parser.add_argument("--live-matches", type=int, default=10, help="matches in play in the live window")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--recorded", default=None,
+                        help="replay the responses in this response cache directory instead of synthetic data")
+    parser.add_argument("--latency-ms", type=float, default=0, help="mean added response time")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="uniform spread around the mean latency")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per minute, 0 for no limit")
+    args = parser.parse_args()
+
+    if args.recorded:
+        dataset = RecordedDataset(args.recorded)
+    else:
+        dataset = SyntheticDataset(args.competitions, [int(s) for s in args.seasons.split(",")], args.teams,
+                                   args.matches, args.live_matches, args.seed)
+        # the synthetic ids leave room for this much
+        if args.competitions >= 100 or args.teams >= 1000 or dataset.matches_per_season >= 10000:
+            parser.error("at most 99 competitions, 999 teams and 9999 matches per competition season")
+    print(f"Serving {dataset.expected()['matches']} season matches on port {args.port}{BASE_PATH}")
+    web.run_app(FakeApi(dataset, args.latency_ms, args.jitter_ms, args.rate_limit).app(), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import os
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# port of the Prometheus endpoint (/metrics)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
+
+API_RESPONSES = Counter("producer_api_responses_total",
+                        "Responses used, by source: fresh cache entry, 304 revalidation, download or rate limit",
+                        ["source"])
+API_REQUEST_SECONDS = Histogram("producer_api_request_seconds", "Round trip of a request to the football-data API")
+API_QUOTA_REMAINING = Gauge("producer_api_quota_remaining",
+                            "Requests left in the current minute, as reported by the API")
+RATE_LIMIT_WAIT_SECONDS = Histogram("producer_rate_limit_wait_seconds", "Time spent waiting for a rate limiter token")
+RECORDS_PRODUCED = Counter("producer_records_produced_total", "Records handed to the Kafka producer", ["topic"])
+PAYLOADS_UNCHANGED = Counter("producer_payloads_unchanged_total",
+                             "Payloads skipped because they were already produced", ["topic"])
+FLUSH_SECONDS = Histogram("producer_flush_seconds", "Time for the Kafka producer to deliver its buffered records")
+RUN_SECONDS = Histogram("producer_run_seconds", "Duration of a full sync or of a live window poll", ["mode"],
+                        buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 2400))
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> None:
+    start_http_server(port)
@@ -1,11 +1,24 @@
-import requests
+import argparse
+import asyncio
+import aiohttp
 from kafka import KafkaProducer
-import json
 import os
+import sys
 import time
+from datetime import date, timedelta
+from metrics import (
+    API_REQUEST_SECONDS, API_RESPONSES, FLUSH_SECONDS, PAYLOADS_UNCHANGED,
+    RATE_LIMIT_WAIT_SECONDS, RECORDS_PRODUCED, RUN_SECONDS, start_metrics_server
+)
+from rate_limit import TokenBucket
+from records import competition_records, team_records, match_records, match_record, scorer_records, standing_records
+from response_cache import ResponseCache, payload_hash
+# wire_format.py and schemas.json live in python-scripts/shared; the images copy them next to this file
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+from wire_format import FORMATS, SchemaRegistry, encode
 
 # Configuration
-API_BASE_URL = "http://api.football-data.org/v4/"
+API_BASE_URL = os.getenv("FOOTBALL_API_BASE_URL", "http://api.football-data.org/v4/")
 HEADERS = {"X-Auth-Token": os.getenv("FOOTBALL_API_KEY", "8bdeca631d7b495d81f502451792f341")}
 KAFKA_BROKER = "kafka:29092"
 TOPICS = {
@@ -16,135 +29,306 @@ TOPICS = {
     "standings": "standings-topic",
     "players": "players-topic",
 }
+SEASONS = [int(season) for season in os.getenv("FOOTBALL_SEASONS", "2022,2023,2024").split(",")]
+
+# football-data.org quota (free tier: 10 requests per minute)
+RATE_LIMIT_PER_MINUTE = int(os.getenv("FOOTBALL_API_RATE_LIMIT", "10"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("FOOTBALL_API_MAX_CONCURRENCY", "4"))
+MAX_RETRIES = 3
+REQUEST_TIMEOUT = 30
+
+# Response cache: finished seasons never change, so they are pinned for a long time
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".response_cache"))
+CURRENT_SEASON = int(os.getenv("CURRENT_SEASON", max(SEASONS)))
+LIVE_SEASON_TTL = int(os.getenv("LIVE_SEASON_TTL", "0"))
+CLOSED_SEASON_TTL = int(os.getenv("CLOSED_SEASON_TTL", str(30 * 24 * 3600)))
+
+# Live window polling
+LIVE_WINDOW_DAYS = int(os.getenv("LIVE_WINDOW_DAYS", "1"))
+LIVE_POLL_INTERVAL = int(os.getenv("LIVE_POLL_INTERVAL", "15"))
+LIVE_STATUSES = "IN_PLAY,PAUSED,FINISHED"
+
+# Kafka batching: messages are grouped per partition instead of flushed one by one
+KAFKA_BATCH_SIZE = int(os.getenv("KAFKA_BATCH_SIZE", str(64 * 1024)))
+KAFKA_LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", "50"))
+# Wire format: "json" or schema'd "msgpack", compressed per batch with zstd, lz4, gzip or none
+WIRE_FORMAT = os.getenv("WIRE_FORMAT", "json")
+KAFKA_COMPRESSION_TYPE = os.getenv("KAFKA_COMPRESSION_TYPE", "zstd")
 
 # Initialize Kafka Producer
 producer = KafkaProducer(
     bootstrap_servers=KAFKA_BROKER,
-    value_serializer=lambda v: json.dumps(v).encode("utf-8")
+    key_serializer=lambda k: str(k).encode("utf-8"),
+    batch_size=KAFKA_BATCH_SIZE,
+    linger_ms=KAFKA_LINGER_MS,
+    compression_type=None if KAFKA_COMPRESSION_TYPE == "none" else KAFKA_COMPRESSION_TYPE,
 )
+schema_registry = SchemaRegistry()
 
+response_cache = ResponseCache(RESPONSE_CACHE_DIR)
+# (url, payload) pairs sent to Kafka but not yet confirmed by a flush
+pending_published = []
+
+
+def season_ttl(season) -> int:
+    """How long a cached response for ``season`` can be served without revalidation."""
+    return CLOSED_SEASON_TTL if season < CURRENT_SEASON else LIVE_SEASON_TTL
+
+
+async def fetch_json(session: aiohttp.ClientSession, limiter: TokenBucket, path: str, ttl: int = LIVE_SEASON_TTL) -> dict:
+    """
+    GET ``path`` from the football-data API under the shared rate limiter.
+
+    Fresh cache entries are returned without touching the API; stale ones are
+    revalidated with a conditional request so a 304 costs no download.
+    """
+    url = f"{API_BASE_URL}{path}"
+    entry = response_cache.get(url)
+    if entry and response_cache.is_fresh(entry):
+        API_RESPONSES.labels("cache").inc()
+        return entry["body"]
+
+    for attempt in range(1, MAX_RETRIES + 1):
+        waiting_since = time.monotonic()
+        await limiter.acquire()
+        started_at = time.monotonic()
+        RATE_LIMIT_WAIT_SECONDS.observe(started_at - waiting_since)
+        headers = {}
+        try:
+            request_headers = {**HEADERS, **response_cache.conditional_headers(entry)}
+            async with session.get(url, headers=request_headers) as response:
+                headers = response.headers
+                if response.status == 429:
+                    API_RESPONSES.labels("rate_limited").inc()
+                    retry_after = headers.get("Retry-After") or headers.get("X-RequestCounter-Reset") or 60
+                    limiter.block_for(float(retry_after))
+                    print(f"Rate limited on {path}, retrying in {retry_after}s (attempt {attempt}/{MAX_RETRIES}).")
+                    continue
+                if response.status == 304 and entry:
+                    API_RESPONSES.labels("not_modified").inc()
+                    response_cache.touch(url, entry, ttl)
+                    return entry["body"]
+                response.raise_for_status()
+                body = await response.json()
+                API_RESPONSES.labels("download").inc()
+                response_cache.store(url, body, headers, ttl)
+                return body
+        finally:
+            API_REQUEST_SECONDS.observe(time.monotonic() - started_at)
+            limiter.release(headers)
+    raise RuntimeError(f"Giving up on {path} after {MAX_RETRIES} rate-limited attempts")
+
+
+def send(topic: str, key, value) -> None:
+    """Encode ``value`` in the configured wire format and hand it to the producer."""
+    data, headers = encode(topic, value, FORMATS[WIRE_FORMAT], schema_registry)
+    producer.send(topic, key=key, value=data, headers=headers)
+    RECORDS_PRODUCED.labels(topic).inc()
 
-def fetch_competitions():
-    try:
-        response = requests.get(f"{API_BASE_URL}competitions/", headers=HEADERS)
-        response.raise_for_status()
-        competitions = response.json().get("competitions", [])
 
-        producer.send(TOPICS["competitions"], value=competitions)
+def publish(topic: str, records: list, path: str, payload) -> bool:
+    """
+    Produce one keyed message per entity in ``records`` unless ``payload`` is
+    identical to what was last produced for ``path``.
+
+    Messages are left to the producer's linger/batch settings; the cache is
+    only told about them once ``flush_published`` has confirmed delivery.
+    """
+    url = f"{API_BASE_URL}{path}"
+    if response_cache.is_unchanged(url, payload):
+        PAYLOADS_UNCHANGED.labels(topic).inc()
+        return False
+    for key, value in records:
+        send(topic, key, value)
+    pending_published.append((url, payload))
+    return True
+
+
+def flush_published() -> None:
+    """Wait for every buffered message, then remember the payloads as published."""
+    with FLUSH_SECONDS.time():
         producer.flush()
-        print(f"Produced {len(competitions)} competitions to Kafka.")
+    while pending_published:
+        url, payload = pending_published.pop()
+        response_cache.mark_published(url, payload)
+
+
+async def fetch_competitions(session, limiter):
+    try:
+        path = "competitions/"
+        competitions = (await fetch_json(session, limiter, path)).get("competitions", [])
+
+        records = competition_records(competitions)
+        if publish(TOPICS["competitions"], records, path, competitions):
+            print(f"Produced {len(competitions)} competitions to Kafka.")
+        else:
+            print("Competitions unchanged, skipped producing.")
         competition_codes = [c["code"] for c in competitions]
         competition_names = [c["name"] for c in competitions]
         return competition_codes, competition_names
     except Exception as e:
         print(f"Error fetching competitions: {e}")
-        return []
+        return [], []
 
 
-def fetch_teams_by_competition(competition_code, season):
+async def fetch_teams_by_competition(session, limiter, competition_code, season):
     try:
-        response = requests.get(f"{API_BASE_URL}competitions/{competition_code}/teams?season={season}", headers=HEADERS)
-        response.raise_for_status()
-        teams = response.json().get("teams", [])
-        competition = response.json().get("competition", {}) if response else "Unknown"
-
-        data = {"season": season, "competition": competition, "teams": teams}
-        
-        producer.send(TOPICS["teams"], value=data)
-        producer.flush()
-        print(f"Produced {len(teams)} teams.")
+        path = f"competitions/{competition_code}/teams?season={season}"
+        payload = await fetch_json(session, limiter, path, season_ttl(season))
+        teams = payload.get("teams", [])
+        competition = payload.get("competition", {})
+
+        records = team_records(payload, season)
+        if not publish(TOPICS["teams"], records, path, payload):
+            print(f"Teams unchanged for competition {competition_code}, season {season}, skipped producing.")
+            return
+        print(f"Produced {len(teams)} teams for competition {competition.get('name', competition_code)}, season {season}.")
     except Exception as e:
-        print(f"Error fetching teams for competition {response.json().get('competition', {}).get('name', '')}: {e}")
-        return {}
+        print(f"Error fetching teams for competition {competition_code}, season {season}: {e}")
 
 
-def fetch_matches_by_competition(competition_code, season):
+async def fetch_matches_by_competition(session, limiter, competition_code, season):
     try:
-        response = requests.get(f"{API_BASE_URL}competitions/{competition_code}/matches?season={season}", headers=HEADERS)
-        response.raise_for_status()
-        matches = response.json().get("matches", [])
-        competition = response.json().get("competition", {}) if response else "Unknown"
-        data = {"season": season, "competition": competition, "matches": matches}        
+        path = f"competitions/{competition_code}/matches?season={season}"
+        payload = await fetch_json(session, limiter, path, season_ttl(season))
+        matches = payload.get("matches", [])
+        competition = payload.get("competition", {})
 
-        producer.send(TOPICS["matches"], value=data)
-        producer.flush()
-        print(f"Produced {len(matches)} matches for competition {response.json().get('competition', {}).get('name', '')}, season {season}.")
+        records = match_records(payload, season)
+        if not publish(TOPICS["matches"], records, path, payload):
+            print(f"Matches unchanged for competition {competition_code}, season {season}, skipped producing.")
+            return
+        print(f"Produced {len(matches)} matches for competition {competition.get('name', competition_code)}, season {season}.")
     except Exception as e:
-        print(f"Error fetching matches for competition {response.json().get('competition', {}).get('name', '')}, season {season}: {e}")
+        print(f"Error fetching matches for competition {competition_code}, season {season}: {e}")
 
 
-def fetch_top_scorers(competition_code, season):
+async def fetch_top_scorers(session, limiter, competition_code, season):
     try:
-        response = requests.get(f"{API_BASE_URL}competitions/{competition_code}/scorers?season={season}", headers=HEADERS)
-        response.raise_for_status()
-        scorers = response.json().get("scorers", [])
-        competition = response.json().get("competition", {}) if response else "Unknown"
-        
-        data = {"season": season, "competition": competition, "scorers": scorers}
-        producer.send(TOPICS["top_scorers"], value=data)
-        producer.flush()
-        print(f"Produced {len(scorers)} top scorers for competition {response.json().get('competition', {}).get('name', '')}, season {season}.")
+        path = f"competitions/{competition_code}/scorers?season={season}"
+        payload = await fetch_json(session, limiter, path, season_ttl(season))
+        scorers = payload.get("scorers", [])
+        competition = payload.get("competition", {})
+
+        records = scorer_records(payload, season)
+        if not publish(TOPICS["top_scorers"], records, path, payload):
+            print(f"Top scorers unchanged for competition {competition_code}, season {season}, skipped producing.")
+            return
+        print(f"Produced {len(scorers)} top scorers for competition {competition.get('name', competition_code)}, season {season}.")
     except Exception as e:
-        print(f"Error fetching top scorers for competition {response.json().get('competition', {}).get('name', '')}, season {season}: {e}")
+        print(f"Error fetching top scorers for competition {competition_code}, season {season}: {e}")
+
 
-def fetch_standings(competition_code, season):
+async def fetch_standings(session, limiter, competition_code, season):
     try:
-        response = requests.get(f"{API_BASE_URL}competitions/{competition_code}/standings?season={season}", headers=HEADERS)
-        response.raise_for_status()
-        standings = response.json()
-        competition = response.json().get("competition", {}) if response else "Unknown"
-        
-        data = {"season": season, "competition": competition, "standings": standings}
-        
-        producer.send(TOPICS["standings"], value=data)
-        producer.flush()
-        print(f"Produced {len(standings)} standings for competition {response.json().get('competition', {}).get('name', '')}, season {season}.")
+        path = f"competitions/{competition_code}/standings?season={season}"
+        payload = await fetch_json(session, limiter, path, season_ttl(season))
+        competition = payload.get("competition", {})
+
+        records = standing_records(payload, season)
+        if not publish(TOPICS["standings"], records, path, payload):
+            print(f"Standings unchanged for competition {competition_code}, season {season}, skipped producing.")
+            return
+        print(f"Produced {len(records)} standings for competition {competition.get('name', competition_code)}, season {season}.")
     except Exception as e:
-        print(f"Error fetching standings for competition {response.json().get('competition', {}).get('name', '')}, season {season}: {e}")
-        
+        print(f"Error fetching standings for competition {competition_code}, season {season}: {e}")
+
 
 def fetch_players():
-    pass                
-    
+    pass
+
+
+async def poll_live_window(session, limiter, seen: dict) -> int:
+    """
+    Poll the rolling match window once and produce every match that changed.
+
+    ``seen`` maps match id to the hash of the version last produced and is
+    updated in place; matches that left the window are dropped from it, so
+    it stays the size of one window. Returns the number of matches produced.
+    """
+    today = date.today()
+    date_from = (today - timedelta(days=LIVE_WINDOW_DAYS)).isoformat()
+    date_to = (today + timedelta(days=1)).isoformat()
+    path = f"matches?dateFrom={date_from}&dateTo={date_to}&status={LIVE_STATUSES}"
+    matches = (await fetch_json(session, limiter, path)).get("matches", [])
+
+    produced = 0
+    for match in matches:
+        match_id = match.get("id")
+        fingerprint = payload_hash(match)
+        if match_id is None or seen.get(match_id) == fingerprint:
+            continue
+        send(TOPICS["matches"], match_id, match_record(match))
+        seen[match_id] = fingerprint
+        produced += 1
+    in_window = {match.get("id") for match in matches}
+    for match_id in [match_id for match_id in seen if match_id not in in_window]:
+        del seen[match_id]
+    if produced:
+        with FLUSH_SECONDS.time():
+            producer.flush()
+    return produced
+
+
+async def run_live_polling():
+    """Poll the live window forever, producing one record per changed match."""
+    limiter = TokenBucket(RATE_LIMIT_PER_MINUTE)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    seen = {}
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while True:
+            started_at = time.monotonic()
+            try:
+                produced = await poll_live_window(session, limiter, seen)
+                if produced:
+                    print(f"Produced {produced} changed matches from the live window.")
+            except Exception as e:
+                print(f"Error polling live window: {e}")
+            RUN_SECONDS.labels("live").observe(time.monotonic() - started_at)
+            await asyncio.sleep(max(0.0, LIVE_POLL_INTERVAL - (time.monotonic() - started_at)))
+
+
+async def run_full_sync():
+    """Fetch every competition x season x endpoint concurrently under one rate limiter."""
+    limiter = TokenBucket(RATE_LIMIT_PER_MINUTE)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        competition_codes, competition_names = await fetch_competitions(session, limiter) ## competitions
+
+        async def bounded(fetch, competition_code, season):
+            async with semaphore:
+                await fetch(session, limiter, competition_code, season)
+
+        tasks = []
+        for competition_code, competition_name in zip(competition_codes, competition_names):
+            print(f"Scheduling teams, matches, top scorers and standings for competition {competition_name}...")
+            for season in SEASONS:
+                for fetch in (fetch_teams_by_competition, fetch_matches_by_competition, fetch_top_scorers, fetch_standings):
+                    tasks.append(bounded(fetch, competition_code, season))
+
+        started_at = time.monotonic()
+        await asyncio.gather(*tasks)
+        flush_published()
+        RUN_SECONDS.labels("full").observe(time.monotonic() - started_at)
+        print(f"Completed {len(tasks)} fetches in {time.monotonic() - started_at:.1f}s.")
+
 
 # Main process
 def main():
     """Fetch data from the football-data API and produce to Kafka topics."""
-    competition_codes, competition_names = fetch_competitions() ## competitions
-    seasons = [2022, 2023, 2024]
-    
-    # Fetch data for each competition and season
-    for competition_code, competition_name in zip(competition_codes, competition_names):
-        for season in seasons:
-
-            print(f"Fetching teams for competition {competition_name}...")
-            try:
-                fetch_teams_by_competition(competition_code, season) ## teams     
-            except Exception as e:
-                print(f"Skipping teams for competition {competition_name} due to error: {e}")
-            time.sleep(6)
-            
-            print(f"Fetching matches for competition {competition_name}, season {season}...")
-            try:
-                fetch_matches_by_competition(competition_code, season) ## matches
-            except Exception as e:
-                print(f"Skipping matches for competition {competition_name}, season {season} due to error: {e}")
-            time.sleep(6)
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--live", action="store_true",
+                        help="poll in-play and recently finished matches instead of the full historical sweep")
+    args = parser.parse_args()
+    start_metrics_server()
 
-            print(f"Fetching top scorers for competition {competition_name}, season {season}...")
-            try:
-                fetch_top_scorers(competition_code, season) ## top scorers
-            except Exception as e:
-                print(f"Skipping top scorers for competition {competition_code}, season {season} due to error: {e}")
-            time.sleep(6)
-            
-            print(f"Fetching standings for competition {competition_name}, season {season}...")
-            try:
-                fetch_standings(competition_code, season) ## standings
-            except Exception as e:
-                print(f"Skipping standings for competition {competition_code}, season {season} due to error: {e}")
-            time.sleep(6)
-            
+    if args.live:
+        asyncio.run(run_live_polling())
+    else:
+        asyncio.run(run_full_sync())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from metrics import API_QUOTA_REMAINING
+
+
+class TokenBucket:
+    """
+    Token bucket shared by every request made to the football-data API.
+
+    Tokens refill continuously at ``rate_per_minute`` up to ``capacity``, so a
+    fresh bucket can burst through the whole per-minute quota. The bucket is
+    re-synced from the quota headers returned with each response, and a 429
+    blocks every caller until the window the API asked for has elapsed.
+    """
+
+    def __init__(self, rate_per_minute: int, capacity: int = None):
+        self.capacity = capacity or rate_per_minute
+        self.fill_rate = rate_per_minute / 60.0
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.fill_rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+    def release(self, headers) -> None:
+        """Account for a finished request and sync with the API's view of the quota."""
+        self.in_flight = max(0, self.in_flight - 1)
+        available = headers.get("X-Requests-Available-Minute")
+        if available is None:
+            return
+        API_QUOTA_REMAINING.set(float(available))
+        self._refill()
+        # Requests still in flight have taken a token but are not counted by the API yet
+        self.tokens = max(0.0, min(self.capacity, float(available) - self.in_flight))
+        if self.tokens < 1:
+            reset = headers.get("X-RequestCounter-Reset")
+            if reset:
+                self.block_for(float(reset))
+
+    def block_for(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds``."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
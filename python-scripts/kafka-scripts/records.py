@@ -0,0 +1,69 @@
+from typing import Any, Dict, List, Tuple
+
+# (message key, message value) pairs, one per entity
+Records = List[Tuple[Any, Dict]]
+
+
+def competition_records(competitions: list) -> Records:
+    """One record per competition, keyed by competition id."""
+    return [(c.get("id"), c) for c in competitions]
+
+
+def team_records(payload: dict, season) -> Records:
+    """One record per team of a competition season."""
+    competition = payload.get("competition", {})
+    return [
+        (f"{competition.get('id')}-{season}-{team.get('id')}",
+         {"season": season, "competition": competition, "team": team})
+        for team in payload.get("teams", [])
+    ]
+
+
+def match_records(payload: dict, season) -> Records:
+    """One record per match of a competition season, keyed by match id."""
+    competition = payload.get("competition", {})
+    return [
+        (match.get("id"), {"season": season, "competition": competition, "match": match})
+        for match in payload.get("matches", [])
+    ]
+
+
+def match_record(match: dict) -> dict:
+    """Wrap a single match from the /matches endpoint in the same envelope as the season payloads."""
+    season_start = (match.get("season") or {}).get("startDate") or ""
+    season = int(season_start[:4]) if season_start[:4].isdigit() else None
+    return {"season": season, "competition": match.get("competition", {}), "match": match}
+
+
+def scorer_records(payload: dict, season) -> Records:
+    """One record per top scorer of a competition season."""
+    competition = payload.get("competition", {})
+    return [
+        (f"{competition.get('id')}-{season}-{(scorer.get('player') or {}).get('id')}",
+         {"season": season, "competition": competition, "scorer": scorer})
+        for scorer in payload.get("scorers", [])
+    ]
+
+
+def standing_records(payload: dict, season) -> Records:
+    """
+    One record per standings table row.
+
+    A competition season has TOTAL, HOME and AWAY tables (and one of each per
+    group in cup formats), so the table type is part of the key.
+    """
+    competition = payload.get("competition", {})
+    records = []
+    for table in payload.get("standings", []):
+        for row in table.get("table", []):
+            key = f"{competition.get('id')}-{season}-{table.get('type')}-{(row.get('team') or {}).get('id')}"
+            records.append((key, {
+                "season": season,
+                "competition": competition,
+                "area": payload.get("area"),
+                "stage": table.get("stage"),
+                "type": table.get("type"),
+                "group": table.get("group"),
+                "standing": row,
+            }))
+    return records
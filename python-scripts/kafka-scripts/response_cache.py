@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Union
+
+
+def payload_hash(payload: Any) -> str:
+    """Stable hash of a JSON-serializable payload."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk cache of football-data API responses, one JSON file per URL.
+
+    Each entry keeps the decoded body, the ``ETag`` / ``Last-Modified``
+    validators used for conditional requests, an expiry time and the hash of
+    the last payload produced to Kafka for that URL. Entries past their expiry
+    are revalidated rather than dropped, so an unchanged resource costs a 304
+    instead of a full download and republish.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> Union[Dict, None]:
+        """Return the cache entry for ``url``, or None if there is none."""
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write(self, url: str, entry: Dict) -> None:
+        path = self._path(url)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def is_fresh(entry: Dict) -> bool:
+        return entry.get("expires_at", 0) > time.time()
+
+    @staticmethod
+    def conditional_headers(entry: Union[Dict, None]) -> Dict[str, str]:
+        """Validators to send with a revalidation request."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, body: Any, headers, ttl: float) -> None:
+        """Save a fresh 200 response, keeping the hash of what was last published."""
+        previous = self.get(url) or {}
+        self._write(url, {
+            "url": url,
+            "body": body,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "expires_at": time.time() + ttl,
+            "published_hash": previous.get("published_hash"),
+        })
+
+    def touch(self, url: str, entry: Dict, ttl: float) -> None:
+        """Extend the lifetime of an entry the API confirmed with a 304."""
+        entry["expires_at"] = time.time() + ttl
+        self._write(url, entry)
+
+    def is_unchanged(self, url: str, payload: Any) -> bool:
+        """True if ``payload`` is identical to what was last produced for ``url``."""
+        entry = self.get(url)
+        return bool(entry) and entry.get("published_hash") == payload_hash(payload)
+
+    def mark_published(self, url: str, payload: Any) -> None:
+        entry = self.get(url)
+        if entry is None:
+            return
+        entry["published_hash"] = payload_hash(payload)
+        self._write(url, entry)
@@ -0,0 +1,54 @@
+import asyncio
+import time
+import unittest
+
+from rate_limit import TokenBucket
+
+
+def acquire(bucket: TokenBucket, times: int = 1) -> float:
+    """Seconds taken to acquire ``times`` tokens."""
+    async def run():
+        for _ in range(times):
+            await bucket.acquire()
+    start = time.monotonic()
+    asyncio.run(run())
+    return time.monotonic() - start
+
+
+class TokenBucketTests(unittest.TestCase):
+
+    def test_fresh_bucket_bursts_the_quota(self):
+        bucket = TokenBucket(rate_per_minute=10)
+        self.assertLess(acquire(bucket, 10), 0.05)
+        self.assertEqual(bucket.in_flight, 10)
+        self.assertLess(bucket.tokens, 1)
+
+    def test_refills_at_the_rate(self):
+        # 20 tokens a second, one at a time
+        bucket = TokenBucket(rate_per_minute=1200, capacity=1)
+        self.assertGreaterEqual(acquire(bucket, 3), 0.09)
+
+    def test_release_syncs_with_the_quota_headers(self):
+        bucket = TokenBucket(rate_per_minute=10)
+        acquire(bucket, 2)
+        bucket.release({"X-Requests-Available-Minute": "5"})
+        # the request still in flight is not counted by the API yet
+        self.assertEqual((bucket.in_flight, bucket.tokens), (1, 4.0))
+        bucket.release({})
+        self.assertEqual((bucket.in_flight, bucket.tokens), (0, 4.0))
+
+    def test_exhausted_quota_blocks_until_reset(self):
+        bucket = TokenBucket(rate_per_minute=6000)
+        acquire(bucket)
+        bucket.release({"X-Requests-Available-Minute": "0", "X-RequestCounter-Reset": "0.1"})
+        self.assertEqual(bucket.tokens, 0.0)
+        self.assertGreaterEqual(acquire(bucket), 0.09)
+
+    def test_block_for(self):
+        bucket = TokenBucket(rate_per_minute=6000)
+        bucket.block_for(0.1)
+        self.assertGreaterEqual(acquire(bucket), 0.09)
+
+
+if __name__ == "__main__":
+    unittest.main()
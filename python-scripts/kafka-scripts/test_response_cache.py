@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from response_cache import ResponseCache, payload_hash
+
+URL = "http://api.football-data.org/v4/competitions/PL/matches?season=2024"
+BODY = {"matches": [{"id": 497410, "status": "FINISHED", "score": {"fullTime": {"home": 2, "away": 0}}}]}
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(os.path.join(self.directory.name, "responses"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_store_and_revalidate(self):
+        self.assertIsNone(self.cache.get(URL))
+        self.assertEqual(ResponseCache.conditional_headers(None), {})
+        self.cache.store(URL, BODY, {"ETag": '"v1"', "Last-Modified": "Sat, 17 Aug 2024 16:00:00 GMT"}, ttl=60)
+        entry = self.cache.get(URL)
+        self.assertEqual(entry["body"], BODY)
+        self.assertTrue(ResponseCache.is_fresh(entry))
+        self.assertEqual(ResponseCache.conditional_headers(entry),
+                         {"If-None-Match": '"v1"', "If-Modified-Since": "Sat, 17 Aug 2024 16:00:00 GMT"})
+
+    def test_expired_entries_are_kept_for_revalidation(self):
+        self.cache.store(URL, BODY, {"ETag": '"v1"'}, ttl=0)
+        entry = self.cache.get(URL)
+        self.assertFalse(ResponseCache.is_fresh(entry))
+        # a 304 extends it
+        self.cache.touch(URL, entry, ttl=60)
+        self.assertTrue(ResponseCache.is_fresh(self.cache.get(URL)))
+
+    def test_published_hash(self):
+        self.cache.mark_published(URL, BODY)
+        self.assertFalse(self.cache.is_unchanged(URL, BODY))
+        self.cache.store(URL, BODY, {}, ttl=60)
+        self.cache.mark_published(URL, BODY)
+        self.assertTrue(self.cache.is_unchanged(URL, {"matches": list(BODY["matches"])}))
+        self.assertFalse(self.cache.is_unchanged(URL, {"matches": []}))
+        # survives a new download of the same resource
+        self.cache.store(URL, BODY, {"ETag": '"v2"'}, ttl=60)
+        self.assertEqual(self.cache.get(URL)["published_hash"], payload_hash(BODY))
+
+    def test_corrupt_entry_is_a_miss(self):
+        self.cache.store(URL, BODY, {}, ttl=60)
+        with open(self.cache._path(URL), "w", encoding="utf-8") as f:
+            f.write("{")
+        self.assertIsNone(self.cache.get(URL))
+
+    def test_payload_hash_ignores_key_order(self):
+        self.assertEqual(payload_hash({"a": 1, "b": [1, 2]}), payload_hash({"b": [1, 2], "a": 1}))
+
+
+if __name__ == "__main__":
+    unittest.main()
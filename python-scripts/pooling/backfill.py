@@ -0,0 +1,178 @@
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict
+
+import mysql.connector
+from pymongo import MongoClient
+
+from batch_writer import TABLES
+from data_versions import bump_versions, touched_scopes
+from flatten import PROJECTIONS, ROW_GENERATORS, write_rows
+from mongodb_to_mysql import DATABASE_NAME, DB_CONFIG, MONGO_URI
+from sync_state import ensure_sync_state_table, save_watermarks, server_time
+
+logger = logging.getLogger(__name__)
+
+# documents fetched per MongoDB round trip while exporting
+EXPORT_BATCH_SIZE = 1000
+
+
+def tsv_field(value) -> str:
+    """A value in LOAD DATA's default format: tab separated, backslash escaped, \\N for NULL."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class StagingWriter:
+    """
+    Same interface as BatchWriter, but appends rows to one TSV file per table
+    and kind of write instead of holding them, so exporting a whole collection
+    runs in constant memory. Duplicates are resolved by the merge, in file order.
+    """
+
+    known_ids = None
+
+    def __init__(self, staging_dir: str):
+        self.staging_dir = staging_dir
+        self.files = {}
+        self.rows: Dict[str, int] = {}
+        self.failed_rows = 0
+        self.touched_scopes = set()
+
+    def path(self, table: str, kind: str) -> str:
+        return os.path.join(self.staging_dir, f"{table}.{kind}.tsv")
+
+    def _append(self, table: str, kind: str, row: Dict) -> None:
+        columns, keys = TABLES[table]
+        if any(row.get(key) is None for key in keys):
+            return
+        if (table, kind) not in self.files:
+            self.files[(table, kind)] = open(self.path(table, kind), "w", encoding="utf-8", newline="\n")
+        values = tuple(row.get(column) for column in columns)
+        self.files[(table, kind)].write("\t".join(tsv_field(value) for value in values) + "\n")
+        self.touched_scopes.update(touched_scopes(table, columns, [values]))
+        self.rows[table] = self.rows.get(table, 0) + 1
+
+    def upsert(self, table: str, row: Dict) -> None:
+        self._append(table, "upsert", row)
+
+    def insert_missing(self, table: str, row: Dict) -> None:
+        self._append(table, "insert", row)
+
+    def flush(self) -> Dict[str, int]:
+        for f in self.files.values():
+            f.close()
+        return dict(self.rows)
+
+
+def merge_statement(table: str, staging_table: str, update: bool) -> str:
+    """
+    Set-based merge of a staging table, in load order so the last row of a key
+    wins. The UPDATE clause reads the new values from the selected staging
+    columns instead of the deprecated VALUES(), and qualifies every name: the
+    two tables share column names, so bare ones are ambiguous (MySQL error 1052).
+    """
+    columns, keys = TABLES[table]
+    updates = [
+        f"{table}.{column} = {staging_table}.{column}" for column in columns if column not in keys
+    ] if update else []
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"SELECT {', '.join(f'{staging_table}.{column}' for column in columns)} FROM {staging_table} "
+        f"ORDER BY {staging_table}.seq "
+        f"ON DUPLICATE KEY UPDATE {', '.join(updates) or f'{table}.{keys[0]} = {table}.{keys[0]}'}"
+    )
+
+
+def load_table(connection, staging: StagingWriter, table: str) -> int:
+    """LOAD DATA the staged rows of ``table`` into a temporary table and merge them; returns the rows merged."""
+    columns, _ = TABLES[table]
+    staging_table = f"staging_{table}"
+    merged = 0
+    cursor = connection.cursor()
+    try:
+        # insert-only references first, so full rows for the same key overwrite them
+        for kind, update in (("insert", False), ("upsert", True)):
+            path = staging.path(table, kind)
+            if not os.path.exists(path):
+                continue
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+            cursor.execute(f"CREATE TEMPORARY TABLE {staging_table} AS SELECT {', '.join(columns)} FROM {table} LIMIT 0")
+            cursor.execute(f"ALTER TABLE {staging_table} ADD COLUMN seq BIGINT AUTO_INCREMENT PRIMARY KEY")
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {staging_table} ({', '.join(columns)})", (path,)
+            )
+            loaded = cursor.rowcount
+            try:
+                cursor.execute(merge_statement(table, staging_table, update))
+                connection.commit()
+                merged += loaded
+            except Exception as e:
+                connection.rollback()
+                staging.failed_rows += loaded
+                logger.error(f"Error merging {loaded} staged rows into {table}: {e}")
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging_table}")
+    finally:
+        cursor.close()
+    return merged
+
+
+def main():
+    """Backfill MySQL from MongoDB through TSV files, LOAD DATA and set-based merges."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--staging-dir", default=None,
+                        help="directory for the TSV files (a temporary directory by default)")
+    parser.add_argument("--keep-files", action="store_true", help="keep the TSV files after loading")
+    args = parser.parse_args()
+
+    staging_dir = args.staging_dir or tempfile.mkdtemp(prefix="pooling-backfill-")
+    os.makedirs(staging_dir, exist_ok=True)
+    mongo_client = MongoClient(MONGO_URI)
+    connection = mysql.connector.connect(**DB_CONFIG, allow_local_infile=True)
+    try:
+        db = mongo_client[DATABASE_NAME]
+        started_at = server_time(db)
+
+        # Export: stream every collection through the row generators into TSV files
+        staging = StagingWriter(staging_dir)
+        export_started = time.perf_counter()
+        for collection_name, rows in ROW_GENERATORS.items():
+            documents = db[collection_name].find({}, projection=PROJECTIONS[collection_name], batch_size=EXPORT_BATCH_SIZE)
+            write_rows(rows(documents), staging)
+        staged = staging.flush()
+        export_seconds = time.perf_counter() - export_started
+        logger.info(f"Staged {sum(staged.values())} rows in {export_seconds:.1f}s: {staged}")
+
+        # Load and merge, parents first
+        print(f"{'table':<24}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+        for table in TABLES:
+            if table not in staged:
+                continue
+            load_started = time.perf_counter()
+            merged = load_table(connection, staging, table)
+            seconds = time.perf_counter() - load_started
+            print(f"{table:<24}{merged:>10}{seconds:>10.2f}{merged / seconds if seconds else 0:>12,.0f}")
+        bump_versions(connection, staging.touched_scopes)
+
+        # Let the incremental sync carry on from where the backfill read
+        if staging.failed_rows:
+            logger.warning(f"{staging.failed_rows} rows failed to merge; watermarks left unchanged")
+        else:
+            ensure_sync_state_table(connection)
+            save_watermarks(connection, {collection_name: started_at for collection_name in ROW_GENERATORS})
+    finally:
+        mongo_client.close()
+        connection.close()
+        if not args.keep_files:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
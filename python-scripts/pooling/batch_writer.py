@@ -0,0 +1,280 @@
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Tuple
+
+from data_versions import bump_versions, touched_scopes
+from known_ids import KnownIdCache
+from metrics import CHUNK_SECONDS, ROWS_DEAD_LETTERED, ROWS_FAILED, ROWS_WRITTEN
+
+if TYPE_CHECKING:
+    from dead_letters import DeadLetters
+    from row_hashes import RowHashIndex
+
+logger = logging.getLogger(__name__)
+
+# rows per executemany / transaction
+CHUNK_SIZE = int(os.getenv("MYSQL_BATCH_CHUNK_SIZE", "1000"))
+# queued rows after which the writer flushes on its own
+MAX_PENDING_ROWS = int(os.getenv("MYSQL_BATCH_MAX_PENDING", "50000"))
+# MySQL errors after which a chunk is retried: deadlock, lock wait timeout. Parallel
+# writers inserting the same team or competition reference can deadlock each other.
+RETRYABLE_ERRORS = {1213, 1205}
+MAX_CHUNK_ATTEMPTS = 3
+# MySQL errors after which a row is left for the next cycle rather than dead-lettered: a
+# missing parent row (1452), which a shard running in parallel may not have committed yet.
+# It is dead-lettered once deferred this many times, or at once if its parent is dead-lettered.
+DEFERRED_ERRORS = {1452}
+MAX_DEFERRALS = int(os.getenv("MYSQL_MAX_ROW_DEFERRALS", "5"))
+
+
+def is_connection_error(error: Exception) -> bool:
+    """Client errors (lost connection, server gone, ...) say nothing about the rows being written."""
+    errno = getattr(error, "errno", None)
+    return errno is not None and 2000 <= errno < 3000
+
+
+# table -> (columns, natural key columns), in foreign key order: parents are
+# flushed (and committed) before the tables referencing them
+TABLES = {
+    "areas": (["id", "name", "code", "flag"], ["id"]),
+    "coaches": (
+        ["id", "first_name", "last_name", "name", "date_of_birth", "nationality",
+         "contract_start_date", "contract_end_date"],
+        ["id"],
+    ),
+    "competitions": (["id", "name", "code", "type", "emblem", "area_id"], ["id"]),
+    "teams": (
+        ["id", "name", "short_name", "tla", "crest", "address", "website", "founded", "club_colors", "venue",
+         "area_id", "coach_id", "season"],
+        ["id"],
+    ),
+    "players": (["id", "name", "section", "date_of_birth", "nationality", "team_id"], ["id"]),
+    "team_competitions": (["team_id", "competition_id", "season"], ["team_id", "competition_id", "season"]),
+    "matches": (
+        ["id", "match_date", "status", "stage", "home_team_id", "away_team_id", "home_team_score",
+         "away_team_score", "area_id", "season", "competition_id"],
+        ["id"],
+    ),
+    "top_scorers": (
+        ["player_id", "team_id", "played_matches", "goals", "assists", "penalties", "season", "competition_id"],
+        ["player_id", "competition_id", "season"],
+    ),
+    "standings": (
+        ["team_id", "position", "played_games", "form", "won", "draw", "lost", "points", "goals_for",
+         "goals_against", "goal_difference", "season", "competition_id", "area_id"],
+        ["team_id", "competition_id", "season"],
+    ),
+    "team_season_aggregates": (
+        ["team_id", "competition_id", "season", "played_games", "won", "draw", "lost", "points",
+         "goals_for", "goals_against", "goal_difference", "form", "last_match_date"],
+        ["team_id", "competition_id", "season"],
+    ),
+}
+
+
+# table -> {foreign key column: referenced table}
+FOREIGN_KEYS = {
+    "competitions": {"area_id": "areas"},
+    "teams": {"area_id": "areas", "coach_id": "coaches"},
+    "players": {"team_id": "teams"},
+    "team_competitions": {"team_id": "teams", "competition_id": "competitions"},
+    "matches": {"home_team_id": "teams", "away_team_id": "teams", "area_id": "areas",
+                "competition_id": "competitions"},
+    "top_scorers": {"player_id": "players", "team_id": "teams", "competition_id": "competitions"},
+    "standings": {"team_id": "teams", "competition_id": "competitions", "area_id": "areas"},
+    "team_season_aggregates": {"team_id": "teams", "competition_id": "competitions"},
+}
+
+
+def upsert_statement(table: str) -> str:
+    """INSERT ... ON DUPLICATE KEY UPDATE of every non-key column of ``table``."""
+    columns, keys = TABLES[table]
+    updates = ", ".join(f"{column} = VALUES({column})" for column in columns if column not in keys)
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON DUPLICATE KEY UPDATE {updates or f'{keys[0]} = {keys[0]}'}"
+    )
+
+
+def insert_missing_statement(table: str) -> str:
+    """INSERT of ``table`` rows that leaves existing rows untouched."""
+    columns, keys = TABLES[table]
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON DUPLICATE KEY UPDATE {keys[0]} = {keys[0]}"
+    )
+
+
+class BatchWriter:
+    """
+    Accumulates rows per table and writes them with executemany, one
+    transaction per chunk, instead of a SELECT + INSERT + commit per row.
+
+    Rows are deduplicated on their natural key while queued. ``upsert`` rows
+    overwrite the stored row; ``insert_missing`` rows (the partial team and
+    competition references embedded in matches, scorers, ...) only create it,
+    and are dropped when a full row for the same key is queued, or when the
+    optional ``known_ids`` cache already knows the id exists. With the
+    optional ``row_hashes`` index, upserts whose content MySQL already holds
+    are dropped too.
+
+    With the optional ``dead_letters``, a chunk MySQL rejects is bisected
+    into smaller transactions until the rejected rows are isolated; those are
+    dead-lettered and skipped from then on, and the rest of the chunk is
+    written. Rows rejected for a missing parent are counted as failed
+    instead, and written again by the next cycles, up to ``MAX_DEFERRALS``
+    times or until the parent is dead-lettered itself.
+
+    A flush that wrote rows bumps the data versions of the competitions and
+    teams they belong to, which key the API's response cache.
+    """
+
+    def __init__(self, connection, chunk_size: int = CHUNK_SIZE, max_pending: int = MAX_PENDING_ROWS,
+                 known_ids: KnownIdCache = None, row_hashes: "RowHashIndex" = None,
+                 dead_letters: "DeadLetters" = None):
+        self.connection = connection
+        self.known_ids = known_ids
+        self.row_hashes = row_hashes
+        self.dead_letters = dead_letters
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending
+        self.upserts: Dict[str, Dict[Tuple, Tuple]] = {table: {} for table in TABLES}
+        self.inserts: Dict[str, Dict[Tuple, Tuple]] = {table: {} for table in TABLES}
+        self.pending = 0
+        # rows that could not be written nor dead-lettered since the writer was created
+        self.failed_rows = 0
+        # competition and team scopes written since the last flush, whose data versions it bumps
+        self.touched_scopes = set()
+
+    def _row(self, table: str, row: Dict) -> Tuple[Tuple, Tuple]:
+        columns, keys = TABLES[table]
+        return tuple(row.get(key) for key in keys), tuple(row.get(column) for column in columns)
+
+    def upsert(self, table: str, row: Dict) -> None:
+        """Queue ``row`` to be inserted or to replace the existing row with the same key."""
+        key, values = self._row(table, row)
+        if None in key or (self.dead_letters and self.dead_letters.contains(table, key)):
+            return
+        if self.row_hashes and self.row_hashes.covers(table) and self.row_hashes.is_unchanged(table, key, values):
+            if self.upserts[table].pop(key, None) is not None:
+                self.pending -= 1
+            return
+        # a full row replaces the queued reference for the same key
+        if self.inserts[table].pop(key, None) is not None:
+            self.pending -= 1
+        if key not in self.upserts[table]:
+            self.pending += 1
+        self.upserts[table][key] = values
+        self._maybe_flush()
+
+    def insert_missing(self, table: str, row: Dict) -> None:
+        """Queue ``row`` to be inserted only if no row with the same key exists."""
+        key, values = self._row(table, row)
+        if None in key or key in self.upserts[table] or key in self.inserts[table]:
+            return
+        if self.dead_letters and self.dead_letters.contains(table, key):
+            return
+        if self.known_ids and self.known_ids.covers(table) and self.known_ids.contains(table, key[0]):
+            return
+        self.inserts[table][key] = values
+        self.pending += 1
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if self.pending >= self.max_pending:
+            self.flush()
+
+    def _write_chunk(self, cursor, table: str, statement: str, chunk: list) -> Exception:
+        """Write one chunk in its own transaction, retrying deadlocks; returns the error if it was not committed."""
+        for attempt in range(1, MAX_CHUNK_ATTEMPTS + 1):
+            try:
+                with CHUNK_SECONDS.labels(table).time():
+                    cursor.executemany(statement, chunk)
+                    self.connection.commit()
+                return None
+            except Exception as e:
+                self.connection.rollback()
+                if getattr(e, "errno", None) in RETRYABLE_ERRORS and attempt < MAX_CHUNK_ATTEMPTS:
+                    logger.warning(f"Retrying {len(chunk)} rows to {table} after: {e}")
+                    time.sleep(0.1 * attempt)
+                    continue
+                return e
+
+    def _parent_dead_lettered(self, table: str, values: Tuple) -> bool:
+        """Whether a row references a dead-lettered row, which no later cycle writes."""
+        row = dict(zip(TABLES[table][0], values))
+        return any(row.get(column) is not None and self.dead_letters.contains(parent, (row[column],))
+                   for column, parent in FOREIGN_KEYS.get(table, {}).items())
+
+    def _write_rows(self, cursor, table: str, statement: str, keys: list, values: list, upsert: bool) -> int:
+        """Write rows as one chunk, bisecting it on failure when dead-lettering; returns the rows written."""
+        error = self._write_chunk(cursor, table, statement, values)
+        if error is None:
+            # only committed ids are known to exist
+            if self.known_ids and self.known_ids.covers(table):
+                self.known_ids.add(table, [key[0] for key in keys])
+            if upsert and self.row_hashes and self.row_hashes.covers(table):
+                self.row_hashes.remember(table, zip(keys, values))
+            if self.dead_letters:
+                self.dead_letters.written(table, keys)
+            ROWS_WRITTEN.labels(table).inc(len(values))
+            self.touched_scopes.update(touched_scopes(table, TABLES[table][0], values))
+            return len(values)
+        if self.dead_letters is None or is_connection_error(error):
+            logger.error(f"Error writing {len(values)} rows to {table}: {error}")
+            self.failed_rows += len(values)
+            ROWS_FAILED.labels(table).inc(len(values))
+            return 0
+        if len(values) == 1:
+            if getattr(error, "errno", None) in DEFERRED_ERRORS and not self._parent_dead_lettered(table, values[0]):
+                deferrals = self.dead_letters.defer(table, keys[0])
+                if deferrals < MAX_DEFERRALS:
+                    # counted as failed, so its collection's watermark stays put and the row is read again
+                    logger.warning(f"Deferring {table} row {keys[0]} to the next cycle ({deferrals}): {error}")
+                    self.failed_rows += 1
+                    ROWS_FAILED.labels(table).inc()
+                    return 0
+            try:
+                self.dead_letters.add(table, keys[0], values[0], upsert, error)
+                ROWS_DEAD_LETTERED.labels(table).inc()
+            except Exception as e:
+                logger.error(f"Could not dead-letter {table} row {keys[0]} ({error}): {e}")
+                self.failed_rows += 1
+                ROWS_FAILED.labels(table).inc()
+            return 0
+        middle = len(values) // 2
+        return self._write_rows(cursor, table, statement, keys[:middle], values[:middle], upsert) + \
+            self._write_rows(cursor, table, statement, keys[middle:], values[middle:], upsert)
+
+    def _write(self, table: str, statement: str, rows: Dict[Tuple, Tuple], upsert: bool = False) -> int:
+        written = 0
+        keys, values = list(rows.keys()), list(rows.values())
+        cursor = self.connection.cursor()
+        try:
+            for start in range(0, len(values), self.chunk_size):
+                end = start + self.chunk_size
+                written += self._write_rows(cursor, table, statement, keys[start:end], values[start:end], upsert)
+        finally:
+            cursor.close()
+        return written
+
+    def flush(self) -> Dict[str, int]:
+        """Write every queued row, parents first; returns the rows written per table."""
+        written = {}
+        for table in TABLES:
+            inserts, upserts = self.inserts[table], self.upserts[table]
+            self.inserts[table], self.upserts[table] = {}, {}
+            count = 0
+            if inserts:
+                count += self._write(table, insert_missing_statement(table), inserts)
+            if upserts:
+                count += self._write(table, upsert_statement(table), upserts, upsert=True)
+            if count:
+                written[table] = count
+        self.pending = 0
+        if written:
+            logger.info(f"Flushed rows to MySQL: {written}")
+            bump_versions(self.connection, self.touched_scopes)
+            self.touched_scopes = set()
+        return written
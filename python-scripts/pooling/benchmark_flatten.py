@@ -0,0 +1,119 @@
+import argparse
+import time
+import tracemalloc
+
+from batch_writer import BatchWriter
+from flatten import match_rows, write_rows
+
+COMPETITIONS = 12
+TEAMS_PER_COMPETITION = 20
+
+
+class NullConnection:
+    """Stands in for MySQL so only flattening and batching are measured."""
+
+    def cursor(self):
+        return self
+
+    def executemany(self, statement, rows):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def synthetic_match(match_id, competition, season, matchday, home, away) -> dict:
+    return {
+        "id": match_id,
+        "utcDate": f"{season}-08-{(matchday % 28) + 1:02d}T15:00:00Z",
+        "status": "FINISHED",
+        "matchday": matchday,
+        "stage": "REGULAR_SEASON",
+        "lastUpdated": f"{season + 1}-06-01T00:00:00Z",
+        "area": {"id": 2000 + competition["id"] % 50, "name": "Area", "code": "ARE", "flag": None},
+        "competition": competition,
+        "season": {"id": season, "startDate": f"{season}-08-01", "endDate": f"{season + 1}-05-31"},
+        "homeTeam": {"id": home, "name": f"Team {home}", "shortName": f"T{home}", "tla": "TTT", "crest": None},
+        "awayTeam": {"id": away, "name": f"Team {away}", "shortName": f"T{away}", "tla": "TTT", "crest": None},
+        "score": {"winner": "HOME_TEAM", "duration": "REGULAR",
+                  "fullTime": {"home": 2, "away": 1}, "halfTime": {"home": 1, "away": 0}},
+        "odds": {"msg": "Activate Odds-Package in User-Panel to retrieve odds."},
+        "referees": [{"id": 1, "name": "Referee", "type": "REFEREE", "nationality": "England"}],
+    }
+
+
+def synthetic_documents(seasons: int):
+    """
+    One matches document per competition season holding its whole match list,
+    the largest documents the sync reads. Built lazily, like a cursor.
+    """
+    match_id = 0
+    for season in range(2025 - seasons, 2025):
+        for c in range(COMPETITIONS):
+            competition = {"id": 2000 + c, "name": f"Competition {c}", "code": f"C{c}", "type": "LEAGUE",
+                           "emblem": None}
+            teams = [c * 100 + t for t in range(TEAMS_PER_COMPETITION)]
+            matches = []
+            for matchday, (home, away) in enumerate((h, a) for h in teams for a in teams if h != a):
+                match_id += 1
+                matches.append(synthetic_match(match_id, competition, season, matchday, home, away))
+            yield {"season": season, "competition": competition, "matches": matches}
+
+
+def materialized(seasons: int, writer: BatchWriter) -> int:
+    """Previous shape: every document, then every row, held in lists before writing."""
+    documents = list(synthetic_documents(seasons))
+    rows = list(match_rows(documents))
+    write_rows(rows, writer)
+    writer.flush()
+    return len(rows)
+
+
+def streaming(seasons: int, writer: BatchWriter) -> int:
+    """Generators from cursor to writer; the writer flushes in chunks."""
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    write_rows(counted(match_rows(synthetic_documents(seasons))), writer)
+    writer.flush()
+    return count
+
+
+def measure(run, seasons: int, max_pending: int):
+    writer = BatchWriter(NullConnection(), max_pending=max_pending)
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    rows = run(seasons, writer)
+    seconds = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, seconds, peak
+
+
+def main():
+    """Peak memory and throughput of flattening the matches collection, materialized vs streaming."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--seasons", type=int, default=10, help="seasons in the largest synthetic dataset")
+    parser.add_argument("--max-pending", type=int, default=5000, help="rows the writer queues before flushing")
+    args = parser.parse_args()
+
+    print(f"{'pipeline':<14}{'seasons':>8}{'rows':>10}{'rows/s':>12}{'peak MiB':>10}")
+    for seasons in sorted({1, max(1, args.seasons // 2), args.seasons}):
+        for name, run in (("materialized", materialized), ("streaming", streaming)):
+            rows, seconds, peak = measure(run, seasons, args.max_pending)
+            print(f"{name:<14}{seasons:>8}{rows:>10}{rows / seconds:>12,.0f}{peak / 2 ** 20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+
+import mysql.connector
+
+from mongodb_to_mysql import DB_CONFIG
+
+# tables counted while the pipeline fills MySQL, matches first
+COUNTED_TABLES = {
+    "matches": "competition_id",
+    "teams": None,
+    "standings": "competition_id",
+    "top_scorers": "competition_id",
+}
+
+
+def control(api_url: str, endpoint: str, method: str = "GET") -> dict:
+    """Call a /_control endpoint of the fake API."""
+    request = urllib.request.Request(f"{api_url.rstrip('/')}/_control/{endpoint}", method=method)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def count_rows(cursor, competition_ids: list) -> dict:
+    counts = {}
+    placeholders = ", ".join(["%s"] * len(competition_ids))
+    for table, competition_column in COUNTED_TABLES.items():
+        if competition_column:
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {competition_column} IN ({placeholders})",
+                           competition_ids)
+        else:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def throughput(api_url: str, cursor, timeout: float, poll_interval: float) -> None:
+    """
+    Records per second from API to MySQL: the time from the producer's first
+    request to the fake API until every served match is a MySQL row.
+    """
+    stats = control(api_url, "stats")
+    expected, competition_ids = stats["expected"]["matches"], stats["expected"]["competition_ids"]
+    if not competition_ids:
+        raise SystemExit("The fake API serves no season matches (a recording without any?); nothing to time")
+    baseline = count_rows(cursor, competition_ids)
+    if baseline["matches"] >= expected:
+        raise SystemExit(f"MySQL already holds the {expected} matches served; run against an empty database")
+    print(f"Waiting for the producer to start, {expected} matches expected...")
+
+    while stats["first_request_at"] is None:
+        time.sleep(poll_interval)
+        stats = control(api_url, "stats")
+    started_at = stats["first_request_at"]
+    deadline = time.time() + timeout
+    counts = baseline
+    while counts["matches"] < expected and time.time() < deadline:
+        time.sleep(poll_interval)
+        counts = count_rows(cursor, competition_ids)
+        print(f"\r{time.time() - started_at:8.1f}s  {counts}", end="", flush=True)
+    print()
+
+    seconds = time.time() - started_at
+    stats = control(api_url, "stats")
+    rows = {table: counts[table] - baseline[table] for table in COUNTED_TABLES}
+    if counts["matches"] < expected:
+        print(f"Timed out with {counts['matches']}/{expected} matches in MySQL")
+    print(f"API requests: {stats['requests']} ({stats['rate_limited']} rate limited, "
+          f"{stats['not_modified']} not modified)")
+    print(f"{'table':<14}{'rows':>10}{'rows/s':>12}")
+    for table, count in rows.items():
+        print(f"{table:<14}{count:>10}{count / seconds:>12,.1f}")
+    print(f"{'total':<14}{sum(rows.values()):>10}{sum(rows.values()) / seconds:>12,.1f}   in {seconds:.1f}s")
+
+
+def freshness(api_url: str, cursor, goals: int, goal_interval: float, timeout: float, poll_interval: float) -> None:
+    """
+    Latency from a score changing in the API to the MySQL row showing it,
+    with the producer polling the live window (``producer.py --live``).
+    """
+    pending, latencies = {}, []
+    next_goal_at, scored = time.time(), 0
+    deadline = None
+    while scored < goals or pending:
+        now = time.time()
+        if scored < goals and now >= next_goal_at:
+            change = control(api_url, "goal", method="POST")
+            # a later goal in the same match supersedes the earlier one, which is then seen with it
+            pending[change["id"]] = (change["home"], change["away"], change["changed_at"])
+            scored += 1
+            next_goal_at = now + goal_interval
+            deadline = now + timeout
+        if pending:
+            placeholders = ", ".join(["%s"] * len(pending))
+            cursor.execute(f"SELECT id, home_team_score, away_team_score FROM matches WHERE id IN ({placeholders})",
+                           list(pending))
+            seen_at = time.time()
+            for match_id, home, away in cursor.fetchall():
+                expected_home, expected_away, changed_at = pending[match_id]
+                if (home or 0) >= expected_home and (away or 0) >= expected_away:
+                    latencies.append(seen_at - changed_at)
+                    del pending[match_id]
+                    print(f"match {match_id} {home}-{away} in MySQL after {latencies[-1]:.1f}s")
+        if deadline and time.time() > deadline:
+            print(f"Timed out waiting for {len(pending)} changes")
+            break
+        time.sleep(poll_interval)
+
+    if latencies:
+        latencies.sort()
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        print(f"{len(latencies)} changes: p50 {quantiles[49]:.1f}s, p90 {quantiles[89]:.1f}s, "
+              f"max {latencies[-1]:.1f}s")
+
+
+def main():
+    """End-to-end pipeline benchmark against the fake football-data API (kafka-scripts/fake_api.py)."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("phase", choices=["throughput", "freshness"],
+                        help="throughput: full sync from the first API request to the last match in MySQL; "
+                             "freshness: API score change to MySQL row, with the producer in --live mode")
+    parser.add_argument("--api-url", default="http://localhost:8080", help="fake API, without the /v4/ path")
+    parser.add_argument("--mysql-host", default=DB_CONFIG["host"])
+    parser.add_argument("--mysql-port", type=int, default=3306)
+    parser.add_argument("--goals", type=int, default=20, help="score changes to time (freshness)")
+    parser.add_argument("--goal-interval", type=float, default=5.0, help="seconds between score changes (freshness)")
+    parser.add_argument("--timeout", type=float, default=900.0, help="seconds to wait for the pipeline to catch up")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="seconds between MySQL checks")
+    args = parser.parse_args()
+
+    connection = mysql.connector.connect(**{**DB_CONFIG, "host": args.mysql_host, "port": args.mysql_port})
+    # every check must see the rows committed since the previous one, not a repeatable-read snapshot
+    connection.autocommit = True
+    cursor = connection.cursor()
+    try:
+        if args.phase == "throughput":
+            throughput(args.api_url, cursor, args.timeout, args.poll_interval)
+        else:
+            freshness(args.api_url, cursor, args.goals, args.goal_interval, args.timeout, args.poll_interval)
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
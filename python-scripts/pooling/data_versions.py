@@ -0,0 +1,54 @@
+import logging
+from typing import Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Counters read by the Django API to key its response cache (django_app.models.DataVersion)
+DATA_VERSIONS_TABLE = "data_versions"
+GLOBAL_SCOPE = ("global", 0)
+
+# table -> (competition id column, team id columns) of the scopes a written row changes
+SCOPE_COLUMNS = {
+    "competitions": ("id", []),
+    "teams": (None, ["id"]),
+    "players": (None, ["team_id"]),
+    "team_competitions": ("competition_id", ["team_id"]),
+    "matches": ("competition_id", ["home_team_id", "away_team_id"]),
+    "top_scorers": ("competition_id", ["team_id"]),
+    "standings": ("competition_id", ["team_id"]),
+    "team_season_aggregates": ("competition_id", ["team_id"]),
+}
+
+
+def touched_scopes(table: str, columns: List[str], rows: Iterable[Tuple]) -> Set[Tuple[str, int]]:
+    """Competition and team scopes of rows of ``table`` with the given columns."""
+    competition_column, team_columns = SCOPE_COLUMNS.get(table, (None, []))
+    competition = columns.index(competition_column) if competition_column else None
+    teams = [columns.index(column) for column in team_columns]
+    scopes = set()
+    for values in rows:
+        if competition is not None and values[competition] is not None:
+            scopes.add(("competition", values[competition]))
+        scopes.update(("team", values[team]) for team in teams if values[team] is not None)
+    return scopes
+
+
+def bump_versions(connection, scopes: Set[Tuple[str, int]]) -> None:
+    """
+    Increment the version of every scope, and the global one. Called once the
+    rows are committed, so a version never moves before the data it covers.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.executemany(
+            f"INSERT INTO {DATA_VERSIONS_TABLE} (scope, scope_id, version) VALUES (%s, %s, 1) "
+            f"ON DUPLICATE KEY UPDATE version = version + 1",
+            sorted(scopes | {GLOBAL_SCOPE})
+        )
+        connection.commit()
+    except Exception as e:
+        # the API then serves cached responses until they expire, but the rows are written
+        connection.rollback()
+        logger.warning(f"Could not bump {len(scopes)} data versions: {e}")
+    finally:
+        cursor.close()
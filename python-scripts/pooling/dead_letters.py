@@ -0,0 +1,152 @@
+import argparse
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Tuple
+
+import mysql.connector
+from pymongo import MongoClient
+
+from batch_writer import TABLES, insert_missing_statement, upsert_statement
+from data_versions import bump_versions, touched_scopes
+
+logger = logging.getLogger(__name__)
+
+DEAD_LETTERS_COLLECTION = "dead_letters"
+
+
+def normalized_key(key: Tuple) -> Tuple:
+    return tuple(str(part) for part in key)
+
+
+def letter_id(table: str, key: Tuple) -> str:
+    return f"{table}:{'/'.join(normalized_key(key))}"
+
+
+class DeadLetters:
+    """
+    Rows MySQL rejected, parked in a MongoDB collection with the error that
+    rejected them instead of failing their chunk every cycle.
+
+    The batch writer skips the keys held here, so a poison row costs one
+    bisected chunk once; ``replay`` retries them once the cause is fixed.
+    Rows rejected for a missing parent are only parked after a few cycles,
+    counted by ``defer``, as the parent may just not be committed yet.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.keys = set()
+        # times each row rejected for a missing parent was left for a later cycle
+        self.deferrals: Dict[Tuple[str, Tuple], int] = {}
+        self.lock = threading.Lock()
+
+    def load(self) -> None:
+        """Load the keys of the rows currently dead-lettered."""
+        keys = {(letter["table"], tuple(letter["key"])) for letter in self.collection.find({}, {"table": 1, "key": 1})}
+        with self.lock:
+            self.keys = keys
+        logger.info(f"{len(keys)} dead-lettered rows will be skipped")
+
+    def contains(self, table: str, key: Tuple) -> bool:
+        with self.lock:
+            return (table, normalized_key(key)) in self.keys
+
+    def add(self, table: str, key: Tuple, values: Tuple, upsert: bool, error: Exception) -> None:
+        """Park a rejected row with its error context."""
+        now = datetime.now(timezone.utc)
+        self.collection.update_one(
+            {"_id": letter_id(table, key)},
+            {
+                "$set": {
+                    "table": table,
+                    "key": list(normalized_key(key)),
+                    "row": dict(zip(TABLES[table][0], values)),
+                    "upsert": upsert,
+                    "error": {"errno": getattr(error, "errno", None), "message": str(error)},
+                    "last_failed_at": now,
+                },
+                "$setOnInsert": {"first_failed_at": now, "retry_count": 0},
+            },
+            upsert=True
+        )
+        with self.lock:
+            self.keys.add((table, normalized_key(key)))
+        logger.error(f"Dead-lettered {table} row {key}: {error}")
+
+    def defer(self, table: str, key: Tuple) -> int:
+        """Count one more deferral of a row; returns how many times it was deferred."""
+        with self.lock:
+            deferrals = self.deferrals.get((table, normalized_key(key)), 0) + 1
+            self.deferrals[(table, normalized_key(key))] = deferrals
+            return deferrals
+
+    def written(self, table: str, keys: Iterable[Tuple]) -> None:
+        """Forget the deferrals of rows that are now written."""
+        with self.lock:
+            if self.deferrals:
+                for key in keys:
+                    self.deferrals.pop((table, normalized_key(key)), None)
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self.keys)
+
+
+def replay(collection, connection, table: str = None, limit: int = 0) -> Dict[str, int]:
+    """Write the dead-lettered rows again, parents first; removes the ones that go through."""
+    results = {"replayed": 0, "failed": 0}
+    query = {"table": table} if table else {}
+    letters = sorted(collection.find(query).limit(limit), key=lambda letter: list(TABLES).index(letter["table"]))
+    scopes = set()
+    cursor = connection.cursor()
+    try:
+        for letter in letters:
+            columns, _ = TABLES[letter["table"]]
+            statement = upsert_statement(letter["table"]) if letter.get("upsert") else \
+                insert_missing_statement(letter["table"])
+            values = tuple(letter["row"].get(column) for column in columns)
+            try:
+                cursor.execute(statement, values)
+                connection.commit()
+                collection.delete_one({"_id": letter["_id"]})
+                scopes.update(touched_scopes(letter["table"], columns, [values]))
+                results["replayed"] += 1
+            except Exception as e:
+                connection.rollback()
+                collection.update_one({"_id": letter["_id"]}, {
+                    "$inc": {"retry_count": 1},
+                    "$set": {"error": {"errno": getattr(e, "errno", None), "message": str(e)},
+                             "last_failed_at": datetime.now(timezone.utc)},
+                })
+                results["failed"] += 1
+                logger.error(f"Replay of {letter['_id']} failed: {e}")
+    finally:
+        cursor.close()
+    if results["replayed"]:
+        bump_versions(connection, scopes)
+    return results
+
+
+def main():
+    """Replay the rows dead-lettered by the sync into MySQL."""
+    # imported here, mongodb_to_mysql itself imports this module
+    from mongodb_to_mysql import DATABASE_NAME, DB_CONFIG, MONGO_URI
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--table", choices=list(TABLES), help="only replay rows of this table")
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many rows")
+    args = parser.parse_args()
+
+    mongo_client = MongoClient(MONGO_URI)
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        results = replay(mongo_client[DATABASE_NAME][DEAD_LETTERS_COLLECTION], connection, args.table, args.limit)
+        logger.info(f"Replayed {results['replayed']} rows, {results['failed']} still failing")
+    finally:
+        mongo_client.close()
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
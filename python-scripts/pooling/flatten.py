@@ -0,0 +1,309 @@
+"""
+Flattening of the MongoDB documents into MySQL rows.
+
+Each collection has a generator turning an iterable of documents (a cursor,
+or the documents of a change stream batch) into ``(table, row, update)``
+tuples, one entity at a time, so nothing is materialized between the cursor
+and the batch writer: memory stays bounded by the cursor batch and the
+writer's pending rows however large a document's match list is. ``update``
+is False for the partial references embedded in other entities, which are
+only inserted when missing.
+"""
+import logging
+from datetime import datetime
+from typing import Iterable, Iterator, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+Row = Tuple[str, dict, bool]
+
+# Fields read from each entity; the cursors project everything else away
+TEAM_FIELDS = ["id", "name", "shortName", "tla", "crest", "address", "website", "founded", "clubColors", "venue",
+               "season", "area", "coach", "runningCompetitions"]
+COMPETITION_FIELDS = ["id", "name", "code", "type", "emblem", "area"]
+MATCH_FIELDS = ["id", "utcDate", "status", "stage", "homeTeam", "awayTeam", "score.fullTime", "area", "competition"]
+SCORER_FIELDS = ["player", "team", "playedMatches", "goals", "assists", "penalties"]
+
+
+def entity_projection(singular: str, plural: str, fields: list, *extra: str) -> dict:
+    """Projection of documents holding one entity or (older documents) a list of them."""
+    projection = {"_id": 0, "season": 1, "competition": 1}
+    projection.update({field: 1 for field in extra})
+    projection.update({f"{prefix}.{field}": 1 for prefix in (singular, plural) for field in fields})
+    return projection
+
+
+PROJECTIONS = {
+    "teams": entity_projection("team", "teams", TEAM_FIELDS),
+    "competitions": {"_id": 0, **{field: 1 for field in COMPETITION_FIELDS},
+                     **{f"competitions.{field}": 1 for field in COMPETITION_FIELDS}},
+    "matches": entity_projection("match", "matches", MATCH_FIELDS),
+    "top_scorers": entity_projection("scorer", "scorers", SCORER_FIELDS),
+    "standings": {"_id": 0, "season": 1, "competition": 1, "area": 1, "type": 1, "standing": 1,
+                  "standings.standings.type": 1, "standings.standings.table": 1},
+    "team_season_aggregates": {"_id": 0},
+}
+
+
+def date_converter(utc_date: str) -> str:
+    """
+    Converts a UTC date string to MySQL date format (YYYY-MM-DD).
+    If the input date is invalid or None, returns an empty string.
+    """
+    if not utc_date or utc_date == "":
+        return None
+    try:
+        # Parse the UTC date and format it to MySQL date format
+        mysql_date = datetime.strptime(utc_date, "%Y-%m-%dT%H:%M:%SZ").strftime("%Y-%m-%d")
+        return mysql_date
+    except (ValueError, TypeError):
+        # Handle invalid or None dates
+        logging.warning(f"Invalid date format or None value: {utc_date}")
+        return None
+
+
+def entities_from_row(row, plural, singular) -> list:
+    """Entities held by a MongoDB document, whether it carries a whole list or a single entity."""
+    if singular in row:
+        return [row[singular]] if row[singular] else []
+    return row.get(plural) or []
+
+
+def dig(obj, *keys):
+    """Nested value of ``obj``, None as soon as a level is missing."""
+    for key in keys:
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def id_of(obj) -> Union[None, int]:
+    return obj.get("id") if obj else None
+
+
+# reference rows: inserted only when missing
+def area_row(area) -> Row:
+    return "areas", {'id': area.get('id'), 'name': area.get('name'), 'code': area.get('code'),
+                     'flag': area.get('flag')}, False
+
+
+def coach_row(coach) -> Row:
+    return "coaches", {
+        'id': coach.get('id'),
+        'first_name': coach.get('first_name'),
+        'last_name': coach.get('last_name'),
+        'name': coach.get('name'),
+        'date_of_birth': date_converter(coach.get('date_of_birth')),
+        'nationality': coach.get('nationality'),
+        'contract_start_date': date_converter(coach.get('contract_start_date')),
+        'contract_end_date': date_converter(coach.get('contract_end_date'))
+    }, False
+
+
+def competition_row(competition, area_id, update=False) -> Row:
+    return "competitions", {
+        'id': competition.get('id'),
+        'name': competition.get('name'),
+        'code': competition.get('code'),
+        'type': competition.get('type'),
+        'emblem': competition.get('emblem'),
+        'area_id': area_id
+    }, update
+
+
+def team_ref_row(team) -> Row:
+    # the team references in matches, scorers and standings carry no details
+    return "teams", {'id': team.get('id'), 'name': team.get('name'), 'tla': team.get('tla'),
+                     'crest': team.get('crest')}, False
+
+
+def player_row(player, team_id) -> Row:
+    return "players", {
+        'id': player.get('id'),
+        'name': player.get('name'),
+        'section': player.get('section'),
+        'date_of_birth': date_converter(player.get('dateOfBirth')),
+        'nationality': player.get('nationality'),
+        'team_id': team_id
+    }, False
+
+
+def team_competition_row(team_id, competition_id, season) -> Row:
+    return "team_competitions", {'team_id': team_id, 'competition_id': competition_id, 'season': season}, False
+
+
+# entity rows per collection
+def team_rows(documents: Iterable[dict]) -> Iterator[Row]:
+    """Teams, with their areas, coaches and competitions."""
+    for document in documents:
+        season = document.get("season")
+        competition_from_dict = document.get("competition") or {}
+        for team in entities_from_row(document, "teams", "team"):
+            try:
+                area = team.get("area")
+                area_id = id_of(area)
+                if area:
+                    yield area_row(area)
+                coach = team.get("coach")
+                if coach:
+                    yield coach_row(coach)
+                team_season = team.get("season", season)
+                yield "teams", {
+                    'id': team.get("id"), 'name': team.get("name"), 'short_name': team.get("shortName"),
+                    'tla': team.get("tla"), 'crest': team.get("crest"), 'address': team.get("address"),
+                    'website': team.get("website"), 'founded': team.get("founded"),
+                    'club_colors': team.get("clubColors"), 'venue': team.get("venue"),
+                    'area_id': area_id, 'coach_id': id_of(coach), 'season': team_season
+                }, True
+                for competition in team.get("runningCompetitions") or [competition_from_dict]:
+                    yield competition_row(competition, area_id)
+                    yield team_competition_row(team.get("id"), competition.get("id"), team_season)
+            except Exception as e:
+                logger.error(f"Error processing team: {team.get('id', 'unknown')}: {e}")
+
+
+def competition_rows(documents: Iterable[dict]) -> Iterator[Row]:
+    """Competitions and their areas."""
+    for document in documents:
+        for competition in document.get("competitions", [document]):
+            area = competition.get("area")
+            if area:
+                yield area_row(area)
+            yield competition_row(competition, id_of(area), update=True)
+
+
+def match_rows(documents: Iterable[dict]) -> Iterator[Row]:
+    """Matches, and the areas, competitions and teams they reference."""
+    for document in documents:
+        season = document.get("season")
+        competition_from_dict = document.get("competition") or {}
+        for match in entities_from_row(document, "matches", "match"):
+            try:
+                area = match.get("area")
+                if area:
+                    yield area_row(area)
+                competition = match.get("competition", competition_from_dict)
+                if competition:
+                    yield competition_row(competition, id_of(area))
+                home_team, away_team = match.get("homeTeam"), match.get("awayTeam")
+                if home_team:
+                    yield team_ref_row(home_team)
+                if away_team:
+                    yield team_ref_row(away_team)
+                full_time = dig(match, "score", "fullTime") or {}
+                # keeping status and score up to date
+                yield "matches", {
+                    'id': match.get("id"), 'match_date': date_converter(match.get("utcDate")),
+                    'status': match.get("status"), 'stage': match.get("stage"),
+                    'home_team_id': id_of(home_team), 'away_team_id': id_of(away_team),
+                    'home_team_score': full_time.get("home"), 'away_team_score': full_time.get("away"),
+                    'area_id': id_of(area), 'season': season, 'competition_id': id_of(competition)
+                }, True
+            except Exception as e:
+                logger.error(f"Error processing match {match.get('id', 'unknown')}: {e}")
+
+
+def scorer_rows(documents: Iterable[dict]) -> Iterator[Row]:
+    """Top scorers, with their teams and players."""
+    for document in documents:
+        season = document.get("season")
+        competition = document.get("competition")
+        if competition:
+            yield competition_row(competition, None)
+        competition_id = id_of(competition)
+        for scorer in entities_from_row(document, "scorers", "scorer"):
+            try:
+                team, player = scorer.get("team"), scorer.get("player")
+                team_id = id_of(team)
+                if team:
+                    yield team_ref_row(team)
+                if player:
+                    yield player_row(player, team_id)
+                yield team_competition_row(team_id, competition_id, season)
+                # one scorer row per player, competition and season
+                yield "top_scorers", {
+                    'player_id': id_of(player), 'team_id': team_id,
+                    'played_matches': scorer.get("playedMatches", 0), 'goals': scorer.get("goals", 0),
+                    'assists': scorer.get("assists", 0), 'penalties': scorer.get("penalties", 0),
+                    'season': season, 'competition_id': competition_id
+                }, True
+            except Exception as e:
+                logger.error(f"Error processing scorer {dig(scorer, 'player', 'id')}: {e}")
+
+
+def standings_tables(document) -> list:
+    """Rows of the overall table held by a standings document; the home/away splits are not stored."""
+    if "standing" in document:
+        return [document["standing"]] if document.get("type", "TOTAL") == "TOTAL" and document["standing"] else []
+    tables = dig(document, "standings", "standings") or []
+    return [row for table in tables if table and table.get("type", "TOTAL") == "TOTAL"
+            for row in table.get("table", [])]
+
+
+def standing_rows(documents: Iterable[dict]) -> Iterator[Row]:
+    """Overall table rows, with their teams."""
+    for document in documents:
+        season = document.get("season")
+        competition, area = document.get("competition"), document.get("area")
+        if area:
+            yield area_row(area)
+        if competition:
+            yield competition_row(competition, id_of(area))
+        for standing in standings_tables(document):
+            try:
+                team = standing.get("team")
+                if team:
+                    yield team_ref_row(team)
+                # one standing row per team, competition and season
+                yield "standings", {
+                    'team_id': id_of(team), 'position': standing.get("position", 0),
+                    'played_games': standing.get("playedGames", 0), 'form': standing.get("form"),
+                    'won': standing.get("won", 0), 'draw': standing.get("draw", 0), 'lost': standing.get("lost", 0),
+                    'points': standing.get("points", 0), 'goals_for': standing.get("goalsFor", 0),
+                    'goals_against': standing.get("goalsAgainst", 0),
+                    'goal_difference': standing.get("goalDifference", 0), 'season': season,
+                    'competition_id': id_of(competition), 'area_id': id_of(area)
+                }, True
+            except Exception as e:
+                logger.error(f"Error processing standing: {dig(standing, 'team', 'id')}, Error: {e}")
+
+
+def aggregate_rows(documents: Iterable[dict]) -> Iterator[Row]:
+    """Team season aggregates maintained by the Spark streaming stage, with their teams and competitions."""
+    for aggregate in documents:
+        team_id, competition_id = aggregate.get("team_id"), aggregate.get("competition_id")
+        # the matches shard holding the full references may be running in parallel
+        if competition_id is not None:
+            yield competition_row({'id': competition_id}, None)
+        if team_id is not None:
+            yield team_ref_row({'id': team_id})
+        yield "team_season_aggregates", {
+            'team_id': team_id, 'competition_id': competition_id,
+            'season': aggregate.get("season"), 'played_games': aggregate.get("played_games", 0),
+            'won': aggregate.get("won", 0), 'draw': aggregate.get("draw", 0), 'lost': aggregate.get("lost", 0),
+            'points': aggregate.get("points", 0), 'goals_for': aggregate.get("goals_for", 0),
+            'goals_against': aggregate.get("goals_against", 0),
+            'goal_difference': aggregate.get("goal_difference", 0),
+            'form': aggregate.get("form"), 'last_match_date': aggregate.get("last_match_date")
+        }, True
+
+
+# row generator of each synced collection, in the order the collections are read
+ROW_GENERATORS = {
+    "teams": team_rows,
+    "competitions": competition_rows,
+    "matches": match_rows,
+    "top_scorers": scorer_rows,
+    "standings": standing_rows,
+    "team_season_aggregates": aggregate_rows,
+}
+
+
+def write_rows(rows: Iterable[Row], writer) -> None:
+    """Feed rows to a batch writer, which flushes in chunks as they accumulate."""
+    for table, row, update in rows:
+        if update:
+            writer.upsert(table, row)
+        else:
+            writer.insert_missing(table, row)
@@ -0,0 +1,73 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+KNOWN_ID_CACHE_SIZE = int(os.getenv("KNOWN_ID_CACHE_SIZE", "100000"))
+# reference tables whose ids repeat across matches, scorers and standings
+KNOWN_ID_TABLES = ["areas", "coaches", "competitions", "teams"]
+
+
+class KnownIdCache:
+    """
+    Bounded LRU set of ids known to exist in MySQL, per table.
+
+    The batch writer consults it before queueing an insert-only reference
+    row and records ids once the chunk holding them is committed, so a team
+    seen on thousands of matches is written at most once per process.
+    """
+
+    def __init__(self, tables: Iterable[str] = KNOWN_ID_TABLES, capacity: int = KNOWN_ID_CACHE_SIZE):
+        self.tables = set(tables)
+        self.capacity = capacity
+        self.ids = OrderedDict()
+        self.hits: Dict[str, int] = {table: 0 for table in self.tables}
+        self.misses: Dict[str, int] = {table: 0 for table in self.tables}
+        self.lock = threading.Lock()
+
+    def warm(self, connection) -> None:
+        """Load the existing ids with one SELECT per table."""
+        cursor = connection.cursor()
+        try:
+            for table in self.tables:
+                cursor.execute(f"SELECT id FROM {table}")
+                self.add(table, [row[0] for row in cursor.fetchall()])
+        finally:
+            cursor.close()
+        logger.info(f"Warmed known-id cache with {len(self.ids)} ids")
+
+    def covers(self, table: str) -> bool:
+        return table in self.tables
+
+    def contains(self, table: str, entity_id) -> bool:
+        """Whether ``entity_id`` is known to exist in ``table``; counts a hit or a miss."""
+        key = (table, entity_id)
+        with self.lock:
+            if key in self.ids:
+                self.ids.move_to_end(key)
+                self.hits[table] += 1
+                return True
+            self.misses[table] += 1
+            return False
+
+    def add(self, table: str, entity_ids: Iterable) -> None:
+        """Record ids as present in ``table``, evicting the least recently used beyond capacity."""
+        with self.lock:
+            for entity_id in entity_ids:
+                key = (table, entity_id)
+                self.ids[key] = True
+                self.ids.move_to_end(key)
+            while len(self.ids) > self.capacity:
+                self.ids.popitem(last=False)
+
+    def stats(self, reset: bool = True) -> Dict[str, Dict[str, int]]:
+        """Hit/miss counters per table since the last reset; every hit is a row not sent to MySQL."""
+        with self.lock:
+            stats = {table: {"hits": self.hits[table], "misses": self.misses[table]} for table in self.tables}
+            if reset:
+                self.hits = {table: 0 for table in self.tables}
+                self.misses = {table: 0 for table in self.tables}
+        return stats
@@ -0,0 +1,38 @@
+import os
+import time
+from datetime import datetime
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# port of the Prometheus endpoint (/metrics)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9103"))
+
+DOCUMENTS_READ = Counter("pooling_documents_read_total", "MongoDB documents read", ["collection"])
+ROWS_WRITTEN = Counter("pooling_rows_written_total", "Rows committed to MySQL", ["table"])
+ROWS_FAILED = Counter("pooling_rows_failed_total", "Rows neither written nor dead-lettered", ["table"])
+ROWS_DEAD_LETTERED = Counter("pooling_rows_dead_lettered_total", "Rows parked in the dead letters", ["table"])
+CHUNK_SECONDS = Histogram("pooling_chunk_write_seconds", "Time to write and commit one chunk of rows", ["table"])
+CYCLE_SECONDS = Histogram("pooling_sync_cycle_seconds", "Duration of a poll cycle",
+                          buckets=(0.5, 1, 2.5, 5, 10, 20, 40, 80, 160, 320))
+CHANGE_BATCH_SECONDS = Histogram("pooling_change_batch_seconds", "Time to apply a change stream micro-batch")
+SYNC_LAG_SECONDS = Gauge("pooling_sync_lag_seconds",
+                         "How far behind MongoDB the MySQL copy of each collection is", ["collection"])
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> None:
+    start_http_server(port)
+
+
+def track_cycle(watermarks: dict, cycle_started_at: datetime) -> None:
+    """
+    Report the lag of a poll cycle: a document written just after a
+    collection's watermark waited this long to be read.
+    """
+    for collection_name, watermark in watermarks.items():
+        if watermark is not None:
+            SYNC_LAG_SECONDS.labels(collection_name).set((cycle_started_at - watermark).total_seconds())
+
+
+def track_change(collection_name: str, cluster_time) -> None:
+    """Report the lag of the change stream: the age of the last change applied."""
+    SYNC_LAG_SECONDS.labels(collection_name).set(time.time() - cluster_time.time)
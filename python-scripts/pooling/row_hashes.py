@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, Tuple
+
+from batch_writer import TABLES
+
+logger = logging.getLogger(__name__)
+
+# Columns whose changes are worth an UPDATE, per table with change detection
+CHANGE_DETECTED_COLUMNS = {
+    "matches": ["match_date", "status", "home_team_score", "away_team_score"],
+    "standings": ["position", "played_games", "form", "won", "draw", "lost", "points", "goals_for",
+                  "goals_against", "goal_difference"],
+    "top_scorers": ["team_id", "played_matches", "goals", "assists", "penalties"],
+}
+
+
+def _normalized(values: Iterable) -> Tuple:
+    # MySQL hands back dates and CharField seasons where the documents have strings and ints
+    return tuple(None if value is None else str(value) for value in values)
+
+
+class RowHashIndex:
+    """
+    Content hash of the change-detected columns of every row in MySQL, by
+    natural key, so the batch writer only upserts rows whose content changed:
+    a match goes out again when its status or score moves, not every cycle.
+    """
+
+    def __init__(self, columns: Dict[str, list] = CHANGE_DETECTED_COLUMNS):
+        self.columns = columns
+        self.hashes: Dict[str, Dict[Tuple, bytes]] = {table: {} for table in columns}
+        self.positions = {
+            table: [TABLES[table][0].index(column) for column in table_columns]
+            for table, table_columns in columns.items()
+        }
+        self.unchanged: Dict[str, int] = {table: 0 for table in columns}
+        self.lock = threading.Lock()
+
+    def covers(self, table: str) -> bool:
+        return table in self.columns
+
+    def digest(self, table: str, values: Tuple) -> bytes:
+        """Hash of the change-detected columns of a row, given in the writer's column order."""
+        content = _normalized(values[position] for position in self.positions[table])
+        return hashlib.blake2b(repr(content).encode("utf-8"), digest_size=8).digest()
+
+    def warm(self, connection) -> None:
+        """Load the hashes of the rows already in MySQL, one SELECT per table."""
+        cursor = connection.cursor()
+        try:
+            for table, table_columns in self.columns.items():
+                columns, keys = TABLES[table]
+                cursor.execute(f"SELECT {', '.join(keys + table_columns)} FROM {table}")
+                for row in cursor.fetchall():
+                    values = [None] * len(columns)
+                    for column, value in zip(keys + table_columns, row):
+                        values[columns.index(column)] = value
+                    self.hashes[table][_normalized(row[:len(keys)])] = self.digest(table, tuple(values))
+        finally:
+            cursor.close()
+        logger.info(f"Warmed row hash index: { {table: len(hashes) for table, hashes in self.hashes.items()} }")
+
+    def is_unchanged(self, table: str, key: Tuple, values: Tuple) -> bool:
+        """Whether MySQL already holds this content for ``key``; counts the rows skipped."""
+        digest = self.digest(table, values)
+        with self.lock:
+            if self.hashes[table].get(_normalized(key)) == digest:
+                self.unchanged[table] += 1
+                return True
+        return False
+
+    def remember(self, table: str, rows: Iterable[Tuple[Tuple, Tuple]]) -> None:
+        """Record the content of committed ``(key, values)`` rows."""
+        digests = [(_normalized(key), self.digest(table, values)) for key, values in rows]
+        with self.lock:
+            self.hashes[table].update(digests)
+
+    def stats(self, reset: bool = True) -> Dict[str, int]:
+        """Unchanged rows skipped per table since the last reset."""
+        with self.lock:
+            stats = dict(self.unchanged)
+            if reset:
+                self.unchanged = {table: 0 for table in self.columns}
+        return stats
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Union
+
+logger = logging.getLogger(__name__)
+
+# Field the Spark sink sets to the MongoDB server time on every write
+INGESTED_AT_FIELD = "ingested_at"
+# Re-read this much before the watermark, for bulk writes stamped before the
+# watermark but not yet visible when the previous cycle queried
+SYNC_OVERLAP = timedelta(seconds=int(os.getenv("SYNC_OVERLAP_SECONDS", "30")))
+
+SYNC_STATE_TABLE = "sync_state"
+RESUME_TOKEN_TABLE = "sync_resume_tokens"
+
+
+def ensure_sync_state_table(connection) -> None:
+    """Create the tables holding the per-collection watermarks and the change stream resume tokens."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SYNC_STATE_TABLE} (
+            collection_name VARCHAR(64) PRIMARY KEY,
+            watermark DATETIME(3) NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+        """)
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RESUME_TOKEN_TABLE} (
+            stream_name VARCHAR(64) PRIMARY KEY,
+            resume_token TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+        """)
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def load_watermarks(connection) -> Dict[str, datetime]:
+    """Watermark of every collection synced so far."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT collection_name, watermark FROM {SYNC_STATE_TABLE}")
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def save_watermarks(connection, watermarks: Dict[str, datetime]) -> None:
+    """Persist the watermarks in one transaction."""
+    cursor = connection.cursor()
+    try:
+        cursor.executemany(
+            f"INSERT INTO {SYNC_STATE_TABLE} (collection_name, watermark) VALUES (%s, %s) "
+            f"ON DUPLICATE KEY UPDATE watermark = VALUES(watermark)",
+            list(watermarks.items())
+        )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def server_time(db) -> datetime:
+    """Current MongoDB server time, the clock ``ingested_at`` is stamped with."""
+    return db.command("hello")["localTime"]
+
+
+def changed_since(watermark: Union[datetime, None]) -> dict:
+    """Filter for the documents written since ``watermark``; everything when there is none yet."""
+    if watermark is None:
+        return {}
+    return {INGESTED_AT_FIELD: {"$gte": watermark - SYNC_OVERLAP}}
+
+
+def load_resume_token(connection, stream_name: str) -> Union[dict, None]:
+    """Resume token of the last change applied from ``stream_name``, if any."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT resume_token FROM {RESUME_TOKEN_TABLE} WHERE stream_name = %s", (stream_name,))
+        row = cursor.fetchone()
+        return json.loads(row[0]) if row else None
+    finally:
+        cursor.close()
+
+
+def save_resume_token(connection, stream_name: str, resume_token: dict) -> None:
+    """Persist the resume token of the last applied change."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"INSERT INTO {RESUME_TOKEN_TABLE} (stream_name, resume_token) VALUES (%s, %s) "
+            f"ON DUPLICATE KEY UPDATE resume_token = VALUES(resume_token)",
+            (stream_name, json.dumps(resume_token))
+        )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,23 @@
+import unittest
+
+from backfill import merge_statement
+
+
+class MergeStatementTests(unittest.TestCase):
+
+    def test_upsert_reads_the_staging_columns(self):
+        sql = merge_statement("players", "staging_players", update=True)
+        self.assertNotIn("VALUES(", sql)
+        self.assertTrue(sql.startswith("INSERT INTO players (id, name, "))
+        self.assertIn("FROM staging_players ORDER BY staging_players.seq ON DUPLICATE KEY UPDATE ", sql)
+        self.assertIn("players.name = staging_players.name", sql)
+        # keys are never updated
+        self.assertNotIn("players.id = ", sql)
+
+    def test_insert_only_leaves_existing_rows(self):
+        sql = merge_statement("teams", "staging_teams", update=False)
+        self.assertTrue(sql.endswith("ON DUPLICATE KEY UPDATE teams.id = teams.id"))
+
+
+if __name__ == "__main__":
+    unittest.main()
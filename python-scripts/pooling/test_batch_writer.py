@@ -0,0 +1,173 @@
+import unittest
+
+from batch_writer import MAX_DEFERRALS, TABLES, BatchWriter
+from dead_letters import DeadLetters
+from known_ids import KnownIdCache
+from row_hashes import RowHashIndex
+
+
+class MySQLError(Exception):
+
+    def __init__(self, errno: int):
+        super().__init__(f"MySQL error {errno}")
+        self.errno = errno
+
+
+class FakeConnection:
+    """Commits executemany'd rows per table; rows whose first value is in ``rejected`` fail their chunk."""
+
+    def __init__(self, rejected: dict = None):
+        self.rejected = rejected or {}
+        self.rows = {}
+        self.chunks = []
+        self.uncommitted = []
+
+    def cursor(self):
+        return self
+
+    def executemany(self, statement, rows):
+        table = statement.split()[2]
+        if table == "data_versions":
+            return
+        self.chunks.append((table, len(rows)))
+        for row in rows:
+            if row[0] in self.rejected:
+                raise MySQLError(self.rejected[row[0]])
+        self.uncommitted += [(table, row) for row in rows]
+
+    def commit(self):
+        for table, row in self.uncommitted:
+            self.rows.setdefault(table, []).append(row[0])
+        self.uncommitted = []
+
+    def rollback(self):
+        self.uncommitted = []
+
+    def close(self):
+        pass
+
+
+class FakeCollection:
+
+    def __init__(self):
+        self.documents = {}
+
+    def update_one(self, query, update, upsert=False):
+        self.documents[query["_id"]] = update["$set"]
+
+
+def match(match_id: int, home_score: int = 1, home_team_id: int = 1) -> dict:
+    return {"id": match_id, "match_date": "2024-08-17", "status": "FINISHED", "home_team_id": home_team_id,
+            "away_team_id": 2, "home_team_score": home_score, "away_team_score": 0, "competition_id": 2021}
+
+
+class BatchWriterTests(unittest.TestCase):
+
+    def writer(self, connection, **kwargs):
+        return BatchWriter(connection, chunk_size=4, dead_letters=DeadLetters(FakeCollection()), **kwargs)
+
+    def test_deduplicates_and_writes_parents_first(self):
+        connection = FakeConnection()
+        writer = self.writer(connection)
+        writer.insert_missing("teams", {"id": 1})
+        writer.upsert("matches", match(10))
+        writer.upsert("matches", match(10, home_score=3))
+        # the full row replaces the queued reference
+        writer.upsert("teams", {"id": 1, "name": "Arsenal FC"})
+        writer.insert_missing("teams", {"id": 1})
+        self.assertEqual(writer.pending, 2)
+        self.assertEqual(writer.flush(), {"teams": 1, "matches": 1})
+        self.assertEqual(list(connection.rows), ["teams", "matches"])
+        self.assertEqual(writer.pending, 0)
+
+    def test_bisects_and_dead_letters_the_rejected_row(self):
+        connection = FakeConnection(rejected={13: 1366})
+        writer = self.writer(connection)
+        for match_id in range(10, 18):
+            writer.upsert("matches", match(match_id))
+        self.assertEqual(writer.flush(), {"matches": 7})
+        self.assertEqual(sorted(connection.rows["matches"]), [10, 11, 12, 14, 15, 16, 17])
+        self.assertEqual(writer.failed_rows, 0)
+        self.assertTrue(writer.dead_letters.contains("matches", (13,)))
+        # skipped from then on
+        writer.upsert("matches", match(13))
+        self.assertEqual(writer.pending, 0)
+
+    def test_missing_parent_is_deferred_then_dead_lettered(self):
+        connection = FakeConnection(rejected={20: 1452})
+        writer = self.writer(connection)
+        for cycle in range(1, MAX_DEFERRALS):
+            writer.upsert("matches", match(20))
+            writer.flush()
+            self.assertEqual(writer.failed_rows, cycle)
+            self.assertFalse(writer.dead_letters.contains("matches", (20,)))
+        writer.upsert("matches", match(20))
+        writer.flush()
+        self.assertTrue(writer.dead_letters.contains("matches", (20,)))
+
+    def test_child_of_a_dead_lettered_parent_is_dead_lettered_at_once(self):
+        connection = FakeConnection(rejected={30: 1452})
+        writer = self.writer(connection)
+        writer.dead_letters.add("teams", (7,), (7,) + (None,) * 12, True, MySQLError(1406))
+        writer.upsert("matches", match(30, home_team_id=7))
+        writer.flush()
+        self.assertEqual(writer.failed_rows, 0)
+        self.assertTrue(writer.dead_letters.contains("matches", (30,)))
+
+    def test_connection_errors_are_not_dead_lettered(self):
+        connection = FakeConnection(rejected={40: 2013})
+        writer = self.writer(connection)
+        writer.upsert("matches", match(40))
+        writer.upsert("matches", match(41))
+        self.assertEqual(writer.flush(), {})
+        self.assertEqual(writer.failed_rows, 2)
+        self.assertEqual(writer.dead_letters.count(), 0)
+
+    def test_known_ids_skip_references(self):
+        connection = FakeConnection()
+        writer = self.writer(connection, known_ids=KnownIdCache())
+        writer.insert_missing("teams", {"id": 1})
+        writer.flush()
+        # known once committed
+        writer.insert_missing("teams", {"id": 1})
+        self.assertEqual(writer.pending, 0)
+        self.assertEqual(writer.known_ids.stats()["teams"], {"hits": 1, "misses": 1})
+
+    def test_row_hashes_skip_unchanged_rows(self):
+        connection = FakeConnection()
+        writer = self.writer(connection, row_hashes=RowHashIndex())
+        writer.upsert("matches", match(50))
+        writer.flush()
+        writer.upsert("matches", match(50))
+        self.assertEqual(writer.pending, 0)
+        writer.upsert("matches", match(50, home_score=2))
+        self.assertEqual(writer.flush(), {"matches": 1})
+        self.assertEqual(writer.row_hashes.stats(), {"matches": 1, "standings": 0, "top_scorers": 0})
+
+
+class KnownIdCacheTests(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = KnownIdCache(tables=["teams"], capacity=2)
+        cache.add("teams", [1, 2])
+        self.assertTrue(cache.contains("teams", 1))
+        cache.add("teams", [3])
+        self.assertFalse(cache.contains("teams", 2))
+        self.assertTrue(cache.contains("teams", 1))
+        self.assertTrue(cache.contains("teams", 3))
+        self.assertFalse(cache.covers("matches"))
+
+
+class RowHashIndexTests(unittest.TestCase):
+
+    def test_only_change_detected_columns_count(self):
+        index = RowHashIndex()
+        key, values = (60,), tuple(match(60).get(column) for column in TABLES["matches"][0])
+        index.remember("matches", [(key, values)])
+        # MySQL hands back the key as stored, the stage is not change detected
+        self.assertTrue(index.is_unchanged("matches", ("60",), values[:3] + ("GROUP_STAGE",) + values[4:]))
+        self.assertFalse(index.is_unchanged("matches", key, values[:2] + ("POSTPONED",) + values[3:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
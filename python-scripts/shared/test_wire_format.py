@@ -0,0 +1,117 @@
+import json
+import unittest
+
+from wire_format import JSON, MSGPACK, SchemaRegistry, decode, encode
+
+AREA = {"id": 2072, "name": "England", "code": "ENG", "flag": "https://crests.football-data.org/770.svg"}
+COMPETITION = {"id": 2021, "name": "Premier League", "code": "PL", "type": "LEAGUE",
+               "emblem": "https://crests.football-data.org/PL.png"}
+HOME_TEAM = {"id": 57, "name": "Arsenal FC", "shortName": "Arsenal", "tla": "ARS",
+             "crest": "https://crests.football-data.org/57.png"}
+
+# messages as the producer builds them from football-data.org v4 responses
+MESSAGES = [
+    ("competitions-topic", {
+        "id": 2021, "area": AREA, "name": "Premier League", "code": "PL", "type": "LEAGUE",
+        "emblem": "https://crests.football-data.org/PL.png", "plan": "TIER_ONE",
+        "currentSeason": {"id": 2287, "startDate": "2024-08-16", "endDate": "2025-05-25", "currentMatchday": 12,
+                          "winner": None},
+        "numberOfAvailableSeasons": 126, "lastUpdated": "2024-11-20T16:12:01Z",
+    }),
+    # a cup without a code, and no current season key at all
+    ("competitions-topic", {"id": 2000, "area": {"id": 2267, "name": "World"}, "name": "FIFA World Cup",
+                            "code": None, "type": "CUP"}),
+    ("matches-topic", {"season": 2024, "competition": COMPETITION, "match": {
+        "id": 497410, "utcDate": "2024-08-17T14:00:00Z", "status": "FINISHED", "matchday": 1,
+        "stage": "REGULAR_SEASON", "group": None, "lastUpdated": "2024-11-20T00:20:51Z", "area": AREA,
+        "competition": COMPETITION,
+        "season": {"id": 2287, "startDate": "2024-08-16", "endDate": "2025-05-25", "currentMatchday": 12,
+                   "winner": None},
+        "homeTeam": HOME_TEAM,
+        "awayTeam": {"id": 63, "name": "Fulham FC", "shortName": "Fulham", "tla": "FUL",
+                     "crest": "https://crests.football-data.org/63.png"},
+        "score": {"winner": "HOME_TEAM", "duration": "REGULAR", "fullTime": {"home": 2, "away": 0},
+                  "halfTime": {"home": 1, "away": 0}},
+        "odds": {"msg": "Activate Odds-Package in User-Panel to retrieve odds."},
+        "referees": [{"id": 11605, "name": "Michael Oliver", "type": "REFEREE", "nationality": "England"}],
+    }}),
+    # a scheduled knockout match: no away team yet, no half-time score, a competition without a code
+    ("matches-topic", {"season": 2024, "competition": {"id": 2001, "name": "UEFA Champions League"}, "match": {
+        "id": 500001, "utcDate": "2025-05-31T19:00:00Z", "status": "SCHEDULED", "stage": "FINAL",
+        "homeTeam": {"id": None, "name": None}, "score": {"winner": None, "fullTime": {"home": None}},
+    }}),
+    ("teams-topic", {"season": 2024, "competition": COMPETITION, "team": {
+        **HOME_TEAM, "address": "75 Drayton Park London N5 1BU", "website": "http://www.arsenal.com",
+        "founded": 1886, "clubColors": "Red / White", "venue": "Emirates Stadium",
+        "lastUpdated": "2022-02-10T19:48:56Z", "area": AREA,
+        "coach": {"id": 11619, "firstName": "Mikel", "lastName": "Arteta", "name": "Arteta",
+                  "dateOfBirth": "1982-03-26", "nationality": "Spain",
+                  "contract": {"start": "2019-12-01", "until": "2025-06-30"}},
+        "runningCompetitions": [COMPETITION, {"id": 2001, "name": "UEFA Champions League", "code": "CL"}],
+        "squad": [{"id": 4832, "name": "David Raya", "position": "Goalkeeper"}],
+        "staff": [],
+        # not in the schema: kept in the trailing map
+        "marketValue": 1120000000,
+    }}),
+    ("top-scorers-topic", {"season": 2024, "competition": COMPETITION, "scorer": {
+        "player": {"id": 38101, "name": "Erling Haaland", "firstName": "Erling", "lastName": None,
+                   "dateOfBirth": "2000-07-21", "nationality": "Norway", "section": "Offence",
+                   "position": None, "shirtNumber": None, "lastUpdated": "2022-08-08T14:07:51Z"},
+        "team": {"id": 65, "name": "Manchester City FC", "tla": "MCI"},
+        "playedMatches": 12, "goals": 12, "assists": None, "penalties": 2,
+    }}),
+    ("standings-topic", {"season": 2024, "competition": COMPETITION, "area": AREA, "stage": "REGULAR_SEASON",
+                         "type": "TOTAL", "group": None, "standing": {
+        "position": 1, "team": {"id": 64, "name": "Liverpool FC", "shortName": "Liverpool", "tla": "LIV",
+                                "crest": "https://crests.football-data.org/64.png"},
+        "playedGames": 12, "form": "W,W,W,D,W", "won": 10, "draw": 1, "lost": 1, "points": 31,
+        "goalsFor": 24, "goalsAgainst": 8, "goalDifference": 16,
+    }}),
+]
+
+
+class WireFormatRoundTripTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.registry = SchemaRegistry()
+
+    def round_trip(self, topic, value):
+        data, headers = encode(topic, value, MSGPACK, self.registry)
+        self.assertIn(("content-type", MSGPACK.encode("utf-8")), headers)
+        return decode(topic, data, headers, self.registry)
+
+    def test_real_payloads(self):
+        for topic, value in MESSAGES:
+            with self.subTest(topic=topic, id=value.get("id") or (value.get("match") or {}).get("id")):
+                self.assertEqual(self.round_trip(topic, value), value)
+
+    def test_missing_keys_stay_missing(self):
+        decoded = self.round_trip(*MESSAGES[3])
+        self.assertNotIn("awayTeam", decoded["match"])
+        self.assertNotIn("code", decoded["competition"])
+        self.assertNotIn("halfTime", decoded["match"]["score"])
+        self.assertIsNone(decoded["match"]["homeTeam"]["id"])
+
+    def test_values_the_schema_does_not_describe(self):
+        # a list where the schema has one object, an object where it has a list, and a plain value
+        value = {"season": 2024, "competition": [COMPETITION, {"id": 2001}], "team": {
+            "id": 57, "area": "ENG", "runningCompetitions": COMPETITION, "coach": [],
+        }}
+        self.assertEqual(self.round_trip("teams-topic", value), value)
+
+    def test_smaller_than_json(self):
+        for topic, value in MESSAGES:
+            packed, _ = encode(topic, value, MSGPACK, self.registry)
+            self.assertLess(len(packed), len(json.dumps(value)))
+
+    def test_json_and_topics_without_schema(self):
+        value = {"id": 1, "nested": {"a": [1, 2]}}
+        data, headers = encode("unknown-topic", value, MSGPACK, self.registry)
+        self.assertEqual(headers, [("content-type", JSON.encode("utf-8"))])
+        self.assertEqual(decode("unknown-topic", data, headers, self.registry), value)
+        self.assertEqual(decode("matches-topic", json.dumps(value).encode("utf-8"), None, self.registry), value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Wire formats for the Kafka topics.
+
+Messages are either plain JSON or "schema'd" MessagePack. The MessagePack
+format drops the repeated object keys (``homeTeam``, ``score.fullTime``, ...)
+by writing every object as an array ordered by the field list registered for
+its topic in ``schemas.json``. Keys missing from the schema are kept in a
+trailing map, so nothing is lost when the API adds fields; schema fields
+the object does not have are written as a "missing" marker, not as None,
+and values whose shape the schema does not describe are packed as is.
+
+The format of each message is announced in its ``content-type`` header so
+consumers can decode mixed topics. Schemas may only grow by appending fields:
+older messages then decode with the newer schema, without the new fields.
+
+This module and ``schemas.json`` live in python-scripts/shared, the one copy
+the producer and the Spark job both use.
+"""
+import json
+import os
+from typing import Any, Dict, List, Tuple, Union
+
+import msgpack
+
+CONTENT_TYPE_HEADER = "content-type"
+SCHEMA_VERSION_HEADER = "schema-version"
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+FORMATS = {"json": JSON, "msgpack": MSGPACK}
+
+SCHEMA_REGISTRY_PATH = os.getenv(
+    "SCHEMA_REGISTRY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas.json")
+)
+
+
+class SchemaRegistry:
+    """Field layouts per topic, loaded from the local registry file."""
+
+    def __init__(self, path: str = SCHEMA_REGISTRY_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            registry = json.load(f)
+        self.definitions = registry.get("definitions", {})
+        self.topics = registry.get("topics", {})
+
+    def fields(self, topic: str) -> Union[List, None]:
+        schema = self.topics.get(topic)
+        return schema["fields"] if schema else None
+
+    def version(self, topic: str) -> int:
+        return self.topics.get(topic, {}).get("version", 0)
+
+    def resolve(self, spec: Dict) -> Union[List, None]:
+        """Nested field list of a field spec, following ``ref`` into the definitions."""
+        if "ref" in spec:
+            return self.definitions[spec["ref"]]
+        return spec.get("fields")
+
+
+# ext types marking what the arrays cannot say: a key the object did not have (as opposed
+# to a None value), and a value of a shape the schema does not describe, packed as is
+MISSING_EXT = 1
+RAW_EXT = 2
+MISSING = msgpack.ExtType(MISSING_EXT, b"")
+
+
+def _pack_value(value: Any, nested: List, is_list: bool, registry: SchemaRegistry) -> Any:
+    if is_list and isinstance(value, list):
+        return [_pack_value(item, nested, False, registry) for item in value]
+    if not is_list and isinstance(value, dict):
+        return _pack(value, nested, registry)
+    if isinstance(value, (dict, list)):
+        # e.g. a list where the schema has one object: an array here would read as that object
+        return msgpack.ExtType(RAW_EXT, msgpack.packb(value, use_bin_type=True))
+    return value
+
+
+def _unpack_value(value: Any, nested: List, is_list: bool, registry: SchemaRegistry) -> Any:
+    if isinstance(value, msgpack.ExtType) and value.code == RAW_EXT:
+        return msgpack.unpackb(value.data, raw=False)
+    if is_list and isinstance(value, list):
+        return [_unpack_value(item, nested, False, registry) for item in value]
+    if not is_list and isinstance(value, list):
+        return _unpack(value, nested, registry)
+    return value
+
+
+def _pack(obj: Dict, fields: List, registry: SchemaRegistry) -> List:
+    values = []
+    known = set()
+    for spec in fields:
+        name = spec if isinstance(spec, str) else spec["name"]
+        known.add(name)
+        if name not in obj:
+            values.append(MISSING)
+        elif isinstance(spec, str):
+            values.append(obj[name])
+        else:
+            values.append(_pack_value(obj[name], registry.resolve(spec), spec.get("list", False), registry))
+    extras = {k: v for k, v in obj.items() if k not in known}
+    if extras:
+        values.append(extras)
+    return values
+
+
+def _unpack(values: List, fields: List, registry: SchemaRegistry) -> Dict:
+    obj = {}
+    # fields appended to the schema after the message was written are missing from it
+    for spec, value in zip(fields, values):
+        if isinstance(value, msgpack.ExtType) and value.code == MISSING_EXT:
+            continue
+        if isinstance(spec, str):
+            obj[spec] = value
+        else:
+            obj[spec["name"]] = _unpack_value(value, registry.resolve(spec), spec.get("list", False), registry)
+    if len(values) > len(fields) and isinstance(values[len(fields)], dict):
+        obj.update(values[len(fields)])
+    return obj
+
+
+def encode(topic: str, value: Any, content_type: str, registry: SchemaRegistry) -> Tuple[bytes, List[Tuple[str, bytes]]]:
+    """Serialize ``value`` for ``topic``; returns the message bytes and its headers."""
+    fields = registry.fields(topic)
+    if content_type == MSGPACK and fields is not None:
+        data = msgpack.packb(_pack_value(value, fields, False, registry), use_bin_type=True)
+        return data, [
+            (CONTENT_TYPE_HEADER, MSGPACK.encode("utf-8")),
+            (SCHEMA_VERSION_HEADER, str(registry.version(topic)).encode("utf-8")),
+        ]
+    return json.dumps(value).encode("utf-8"), [(CONTENT_TYPE_HEADER, JSON.encode("utf-8"))]
+
+
+def content_type_of(headers) -> str:
+    """Content type announced in Kafka headers; messages without one are JSON."""
+    for key, value in headers or []:
+        if key == CONTENT_TYPE_HEADER and value:
+            return value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else value
+    return JSON
+
+
+def decode(topic: str, data: bytes, headers, registry: SchemaRegistry) -> Any:
+    """Deserialize a message of ``topic`` according to its ``content-type`` header."""
+    if content_type_of(headers) == MSGPACK:
+        fields = registry.fields(topic)
+        if fields is None:
+            raise ValueError(f"No schema registered for topic {topic}")
+        return _unpack_value(msgpack.unpackb(data, raw=False), fields, False, registry)
+    return json.loads(data)
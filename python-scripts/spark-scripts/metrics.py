@@ -0,0 +1,45 @@
+import os
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from pyspark.sql.streaming import StreamingQueryListener
+
+# port of the driver's Prometheus endpoint (/metrics)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9102"))
+
+INPUT_ROWS = Counter("spark_input_rows_total", "Kafka records read", ["query"])
+BATCH_SECONDS = Histogram("spark_batch_seconds", "Duration of a micro-batch", ["query"],
+                          buckets=(0.5, 1, 2.5, 5, 10, 20, 40, 80, 160))
+PROCESSED_ROWS_PER_SECOND = Gauge("spark_processed_rows_per_second", "Throughput of the last micro-batch", ["query"])
+KAFKA_OFFSETS_BEHIND = Gauge("spark_kafka_offsets_behind_latest",
+                             "Consumer lag after the last micro-batch: largest offset gap to the latest offset of "
+                             "a partition", ["query"])
+STATE_ROWS = Gauge("spark_state_rows", "Keys held in the state store", ["query"])
+DOCUMENTS_WRITTEN = Counter("spark_documents_written_total", "Documents upserted into MongoDB", ["collection"])
+
+
+class MetricsListener(StreamingQueryListener):
+    """Turns the progress Spark reports after each micro-batch into metrics, labelled by query name."""
+
+    def onQueryStarted(self, event):
+        pass
+
+    def onQueryProgress(self, event):
+        progress = event.progress
+        INPUT_ROWS.labels(progress.name).inc(progress.numInputRows)
+        BATCH_SECONDS.labels(progress.name).observe(progress.batchDuration / 1000)
+        PROCESSED_ROWS_PER_SECOND.labels(progress.name).set(progress.processedRowsPerSecond or 0)
+        for source in progress.sources:
+            # reported by the Kafka source since Spark 3.2
+            behind = (source.metrics or {}).get("maxOffsetsBehindLatest")
+            if behind is not None:
+                KAFKA_OFFSETS_BEHIND.labels(progress.name).set(float(behind))
+        if progress.stateOperators:
+            STATE_ROWS.labels(progress.name).set(sum(operator.numRowsTotal for operator in progress.stateOperators))
+
+    def onQueryTerminated(self, event):
+        pass
+
+
+def start_metrics_server(spark, port: int = METRICS_PORT) -> None:
+    spark.streams.addListener(MetricsListener())
+    start_http_server(port)
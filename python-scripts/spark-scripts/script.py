@@ -1,8 +1,24 @@
-from pyspark.sql import SparkSession
-from pymongo import MongoClient
+from pyspark import SparkFiles
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.streaming.state import GroupStateTimeout
+from pyspark.sql.types import IntegerType, LongType, StringType, StructField, StructType
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import OperationFailure
 import json
-from typing import Dict, Any, Union
+import os
+import sys
+import time
+import pandas as pd
 import logging
+from metrics import DOCUMENTS_WRITTEN, start_metrics_server
+# wire_format.py and schemas.json live in python-scripts/shared; the images copy them next to this file
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+import wire_format
+from wire_format import CONTENT_TYPE_HEADER, JSON, MSGPACK, SchemaRegistry, decode
+from topic_schemas import (
+    COMPETITIONS_MESSAGE, TEAMS_MESSAGE, MATCHES_MESSAGE, SCORERS_MESSAGE, STANDINGS_MESSAGE
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +40,45 @@ TOPICS = {
     "standings": "standings-topic",
 }
 
+# Streaming: one query over every topic, resumed from its checkpoint on restart
+TRIGGER_INTERVAL = os.getenv("STREAM_TRIGGER_INTERVAL", "10 seconds")
+MAX_OFFSETS_PER_TRIGGER = int(os.getenv("MAX_OFFSETS_PER_TRIGGER", "10000"))
+STARTING_OFFSETS = os.getenv("STARTING_OFFSETS", "earliest")
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "/app/checkpoints")
+
+# Team season aggregates: state is keyed by team+competition+season and dropped
+# once the Kafka-timestamp watermark has moved this far past its last update
+AGGREGATE_WATERMARK_DELAY = os.getenv("AGGREGATE_WATERMARK_DELAY", "10 minutes")
+AGGREGATE_STATE_TIMEOUT_MS = int(os.getenv("AGGREGATE_STATE_TIMEOUT_DAYS", "400")) * 24 * 3600 * 1000
+AGGREGATE_TRIGGER_INTERVAL = os.getenv("AGGREGATE_TRIGGER_INTERVAL", "30 seconds")
+FORM_LENGTH = 5
+
+# A failed query is restarted from its checkpoint, which replays the failed batch, up to this many
+# times in a row; then the job exits non-zero and the container restart policy takes over
+MAX_QUERY_RESTARTS = int(os.getenv("STREAM_MAX_RESTARTS", "3"))
+QUERY_RESTART_DELAY_SECONDS = int(os.getenv("STREAM_RESTART_DELAY_SECONDS", "10"))
+# a query that ran this long before failing starts a new run of restarts
+QUERY_HEALTHY_SECONDS = 600
+
+# Documents per bulk_write call when writing a partition
+MONGO_WRITE_BATCH_SIZE = 1000
+
+# Natural key of each collection's documents; writes are upserts on these fields
+MONGO_KEYS = {
+    "competitions": ["id"],
+    "teams": ["team.id", "competition.id", "season"],
+    "matches": ["match.id"],
+    "top_scorers": ["scorer.player.id", "competition.id", "season"],
+    "standings": ["standing.team.id", "competition.id", "season"],
+    "team_season_aggregates": ["team_id", "competition_id", "season"],
+}
+
+# Set by the server on every write; the pooling service syncs documents newer than its watermark
+INGESTED_AT_FIELD = "ingested_at"
+
+# Schema registry for the executors, loaded from the file shipped with SparkContext.addFile
+_executor_schema_registry = None
+
 def create_spark_session() -> SparkSession:
     """Initialize and return a Spark Session."""
     spark = SparkSession.builder \
@@ -36,139 +91,358 @@ def get_mongo_client() -> MongoClient:
     """Create and return a MongoDB client."""
     return MongoClient(MONGO_URI)
 
-def normalize_document(doc: Any, topic: str) -> Union[Dict, None]:
-    """Normalize document based on topic type."""
-    try:
-        if isinstance(doc, str):
-            doc = json.loads(doc)
-        
-        if isinstance(doc, list):
-            # Handle array data differently based on topic
-            if topic == "competitions":
-                return {"competitions": doc}
-            else:
-                return {"data": doc}
-        
-        elif isinstance(doc, dict):
-            return doc
-        
-        else:
-            logger.error(f"Unsupported document type for topic {topic}: {type(doc)}")
-            return None
-            
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse document as JSON for topic {topic}: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"Error normalizing document for topic {topic}: {e}")
+def executor_schema_registry() -> SchemaRegistry:
+    """Schema registry of the current executor process, loaded once."""
+    global _executor_schema_registry
+    if _executor_schema_registry is None:
+        _executor_schema_registry = SchemaRegistry(SparkFiles.get("schemas.json"))
+    return _executor_schema_registry
+
+@F.udf(returnType=StringType())
+def msgpack_to_json(topic, value, content_type):
+    """Re-encode a MessagePack message as JSON so from_json can parse it."""
+    if value is None or content_type != MSGPACK:
         return None
+    headers = [(CONTENT_TYPE_HEADER, MSGPACK)]
+    return json.dumps(decode(topic, bytes(value), headers, executor_schema_registry()))
 
-def save_to_mongo(data: list, collection_name: str, db) -> None:
-    """Save normalized data to MongoDB."""
-    if not data:
-        logger.warning(f"No data to save to MongoDB for collection {collection_name}")
-        return
+def decode_messages(df: DataFrame, topic: str, schema) -> DataFrame:
+    """Parse Kafka values into a ``message`` struct, negotiating the format from the content-type header."""
+    content_type = F.coalesce(
+        F.expr(f"element_at(filter(headers, h -> h.key = '{CONTENT_TYPE_HEADER}'), 1).value").cast("string"),
+        F.lit(JSON)
+    )
+    json_string = F.when(content_type == MSGPACK, msgpack_to_json(F.lit(topic), F.col("value"), content_type)) \
+        .otherwise(F.col("value").cast("string"))
+    return df.select(F.from_json(json_string, schema).alias("message"), "timestamp") \
+        .where(F.col("message").isNotNull())
 
-    collection = db[collection_name]
-    valid_documents = []
-    
-    for record in data:
-        normalized_doc = normalize_document(record, collection_name)
-        if normalized_doc:
-            valid_documents.append(normalized_doc)
-            logger.debug(f"Normalized document for {collection_name}: {normalized_doc}")
-    
-    if valid_documents:
+def one_or_many(singular: str, plural):
+    """Array of the message's entities: its single entity, or the list older messages carried."""
+    single = F.col(f"message.{singular}")
+    return F.when(single.isNotNull(), F.array(single)).otherwise(plural)
+
+def flatten_competitions(messages: DataFrame) -> DataFrame:
+    return messages.select("message.*").where(F.col("id").isNotNull())
+
+def flatten_entities(singular: str, plural: str):
+    def flatten(messages: DataFrame) -> DataFrame:
+        return messages.select(
+            F.col("message.season").alias("season"),
+            F.col("message.competition").alias("competition"),
+            F.explode(one_or_many(singular, F.col(f"message.{plural}"))).alias(singular)
+        )
+    return flatten
+
+def flatten_standings(messages: DataFrame) -> DataFrame:
+    # Only the overall table is kept; home/away splits would collide on team+competition+season
+    legacy_rows = F.expr(
+        "flatten(transform(filter(message.standings.standings, t -> t.type = 'TOTAL'), t -> t.table))"
+    )
+    return messages \
+        .where(F.col("message.standing").isNull() | (F.coalesce(F.col("message.type"), F.lit("TOTAL")) == "TOTAL")) \
+        .select(
+            F.col("message.season").alias("season"),
+            F.col("message.competition").alias("competition"),
+            F.col("message.area").alias("area"),
+            F.col("message.stage").alias("stage"),
+            F.coalesce(F.col("message.type"), F.lit("TOTAL")).alias("type"),
+            F.col("message.group").alias("group"),
+            F.explode(one_or_many("standing", legacy_rows)).alias("standing")
+        )
+
+# collection name -> (message schema, function flattening parsed messages into one row per entity)
+FLATTENERS = {
+    "competitions": (COMPETITIONS_MESSAGE, flatten_competitions),
+    "teams": (TEAMS_MESSAGE, flatten_entities("team", "teams")),
+    "matches": (MATCHES_MESSAGE, flatten_entities("match", "matches")),
+    "top_scorers": (SCORERS_MESSAGE, flatten_entities("scorer", "scorers")),
+    "standings": (STANDINGS_MESSAGE, flatten_standings),
+}
+
+def get_path(doc: dict, path: str):
+    """Value at a dotted ``path`` of a nested document."""
+    for key in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+def ensure_indexes(db) -> None:
+    """Create the unique natural-key indexes the upserts rely on, and the ingest time index."""
+    for collection_name, keys in MONGO_KEYS.items():
+        db[collection_name].create_index([(INGESTED_AT_FIELD, ASCENDING)], name=f"{collection_name}_{INGESTED_AT_FIELD}")
         try:
-            collection.insert_many(valid_documents)
-            logger.info(f"Successfully inserted {len(valid_documents)} documents into {collection_name}")
-        except Exception as e:
-            logger.error(f"Bulk insert failed for {collection_name}: {e}")
-            # Fallback to individual inserts
-            for doc in valid_documents:
-                try:
-                    collection.insert_one(doc)
-                except Exception as e:
-                    logger.error(f"Failed to insert document into {collection_name}: {e}")
-    else:
-        logger.warning(f"No valid documents to insert into {collection_name}")
-
-def process_stream(df, epoch_id, collection_name: str, db) -> None:
-    """Process each micro-batch of Kafka stream."""
+            # Partial so documents written before the upserts (without these fields) are not indexed
+            db[collection_name].create_index(
+                [(key, ASCENDING) for key in keys],
+                unique=True,
+                name=f"{collection_name}_natural_key",
+                partialFilterExpression={keys[0]: {"$exists": True}}
+            )
+        except OperationFailure as e:
+            logger.warning(f"Could not create unique index on {collection_name}, remove duplicate documents first: {e}")
+
+def save_partition_to_mongo(rows, collection_name: str) -> int:
+    """Upsert one partition of entity rows into MongoDB with a client owned by the partition; returns the rows written."""
+    keys = MONGO_KEYS[collection_name]
+    written = 0
+    client = get_mongo_client()
     try:
-        json_strings = df.selectExpr("CAST(value AS STRING) AS json_string") \
-                        .select("json_string") \
-                        .rdd \
-                        .map(lambda row: row.json_string) \
-                        .collect()
-        
-        logger.info(f"Processing batch with {len(json_strings)} messages for {collection_name}")
-        
-        parsed_data = []
-        for json_string in json_strings:
-            try:
-                if json_string and json_string.strip():
-                    parsed_record = json.loads(json_string)
-                    parsed_data.append(parsed_record)
-                    logger.debug(f"Successfully parsed record for {collection_name}")
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error in {collection_name}: {e}, Data: {json_string[:100]}...")
-        
-        if parsed_data:
-            save_to_mongo(parsed_data, collection_name, db)
-        else:
-            logger.warning(f"No valid data parsed from batch for {collection_name}")
-            
+        collection = client[DATABASE_NAME][collection_name]
+        operations = []
+        for row in rows:
+            doc = row.asDict(recursive=True)
+            key = {field: get_path(doc, field) for field in keys}
+            if key[keys[0]] is None:
+                continue
+            operations.append(UpdateOne(key, {"$set": doc, "$currentDate": {INGESTED_AT_FIELD: True}}, upsert=True))
+            if len(operations) >= MONGO_WRITE_BATCH_SIZE:
+                collection.bulk_write(operations, ordered=False)
+                written += len(operations)
+                operations = []
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+            written += len(operations)
+    finally:
+        client.close()
+    return written
+
+def save_to_mongo(df: DataFrame, collection_name: str) -> None:
+    """Upsert every row of ``df`` from the executors, counting the documents written on the driver."""
+    written = df.sparkSession.sparkContext.accumulator(0)
+    df.foreachPartition(lambda partition: written.add(save_partition_to_mongo(partition, collection_name)))
+    DOCUMENTS_WRITTEN.labels(collection_name).inc(written.value)
+
+def process_stream(df, epoch_id, collection_name: str) -> None:
+    """Process the messages of one topic in a micro-batch."""
+    try:
+        schema, flatten = FLATTENERS[collection_name]
+        rows = flatten(decode_messages(df, TOPICS[collection_name], schema))
+        save_to_mongo(rows, collection_name)
     except Exception as e:
-        logger.error(f"Error processing batch for {collection_name}: {e}")
+        logger.error(f"Error processing batch {epoch_id} for {collection_name}: {e}")
+        # Fail the batch so it is replayed from the checkpoint instead of being committed
+        raise
+
+def process_batch(df, epoch_id) -> None:
+    """Route each micro-batch of the multiplexed stream to its collection by the topic column."""
+    df.persist()
+    try:
+        topics_in_batch = {row.topic for row in df.select("topic").distinct().collect()}
+        for collection_name, topic in TOPICS.items():
+            if topic in topics_in_batch:
+                process_stream(df.where(F.col("topic") == topic), epoch_id, collection_name)
+        logger.info(f"Processed batch {epoch_id} for topics {sorted(topics_in_batch)}")
+    finally:
+        df.unpersist()
 
-def create_stream(spark: SparkSession, topic: str, collection_name: str, db) -> None:
-    """Create and start a stream for a specific topic."""
+def create_stream(spark: SparkSession):
+    """Create and start a single stream subscribed to every topic."""
     try:
-        logger.info(f"Starting stream for topic: {topic}")
+        logger.info(f"Starting stream for topics: {', '.join(TOPICS.values())}")
         
         kafka_df = spark.readStream \
             .format("kafka") \
             .option("kafka.bootstrap.servers", KAFKA_BROKER) \
-            .option("subscribe", topic) \
+            .option("subscribe", ",".join(TOPICS.values())) \
+            .option("includeHeaders", "true") \
+            .option("startingOffsets", STARTING_OFFSETS) \
+            .option("maxOffsetsPerTrigger", MAX_OFFSETS_PER_TRIGGER) \
             .load()
         
         query = kafka_df.writeStream \
-            .foreachBatch(lambda df, epoch_id: process_stream(df, epoch_id, collection_name, db)) \
+            .queryName("kafka-to-mongodb") \
+            .foreachBatch(process_batch) \
+            .option("checkpointLocation", os.path.join(CHECKPOINT_DIR, "kafka-to-mongodb")) \
+            .trigger(processingTime=TRIGGER_INTERVAL) \
             .start()
         
         return query
     
     except Exception as e:
-        logger.error(f"Error creating stream for topic {topic}: {e}")
+        logger.error(f"Error creating stream: {e}")
         raise
 
+TEAM_SEASON_AGGREGATE = StructType([
+    StructField("team_id", LongType()),
+    StructField("competition_id", LongType()),
+    StructField("season", IntegerType()),
+    StructField("played_games", IntegerType()),
+    StructField("won", IntegerType()),
+    StructField("draw", IntegerType()),
+    StructField("lost", IntegerType()),
+    StructField("points", IntegerType()),
+    StructField("goals_for", IntegerType()),
+    StructField("goals_against", IntegerType()),
+    StructField("goal_difference", IntegerType()),
+    StructField("form", StringType()),
+    StructField("last_match_date", StringType()),
+])
+
+# JSON map of match id -> [utcDate, goals for, goals against, Kafka timestamp of the version kept]
+TEAM_SEASON_STATE = StructType([StructField("matches", StringType())])
+
+def team_results(messages: DataFrame) -> DataFrame:
+    """One row per team per match: the match seen from the home side and from the away side."""
+    matches = messages.select(
+        F.coalesce(F.col("message.season"), F.year(F.to_date(F.col("message.match.season.startDate")))).alias("season"),
+        F.coalesce(F.col("message.competition.id"), F.col("message.match.competition.id")).alias("competition_id"),
+        F.col("message.match.id").alias("match_id"),
+        F.col("message.match.utcDate").alias("match_date"),
+        F.col("message.match.status").alias("status"),
+        F.col("message.match.homeTeam.id").alias("home_team_id"),
+        F.col("message.match.awayTeam.id").alias("away_team_id"),
+        F.col("message.match.score.fullTime.home").alias("home_goals"),
+        F.col("message.match.score.fullTime.away").alias("away_goals"),
+        "timestamp"
+    )
+    columns = ["season", "competition_id", "match_id", "match_date", "status", "timestamp"]
+    home = matches.select(*columns, F.col("home_team_id").alias("team_id"),
+                          F.col("home_goals").alias("goals_for"), F.col("away_goals").alias("goals_against"))
+    away = matches.select(*columns, F.col("away_team_id").alias("team_id"),
+                          F.col("away_goals").alias("goals_for"), F.col("home_goals").alias("goals_against"))
+    return home.unionByName(away) \
+        .where(F.col("team_id").isNotNull() & F.col("competition_id").isNotNull() & F.col("match_id").isNotNull())
+
+def summarize_team_season(key, matches: dict) -> dict:
+    """Points, W/D/L, goals and last-5 form (most recent first) of one team season."""
+    team_id, competition_id, season = key
+    won = draw = lost = goals_for = goals_against = 0
+    form = []
+    for match_date, scored, conceded, _ in sorted(matches.values(), key=lambda m: m[0] or "", reverse=True):
+        goals_for += scored
+        goals_against += conceded
+        result = "W" if scored > conceded else "D" if scored == conceded else "L"
+        won += result == "W"
+        draw += result == "D"
+        lost += result == "L"
+        if len(form) < FORM_LENGTH:
+            form.append(result)
+    last_match_date = max((m[0] for m in matches.values() if m[0]), default=None)
+    return {
+        "team_id": team_id,
+        "competition_id": competition_id,
+        "season": season,
+        "played_games": won + draw + lost,
+        "won": won,
+        "draw": draw,
+        "lost": lost,
+        "points": won * 3 + draw,
+        "goals_for": goals_for,
+        "goals_against": goals_against,
+        "goal_difference": goals_for - goals_against,
+        "form": ",".join(form),
+        "last_match_date": last_match_date[:10] if last_match_date else None,
+    }
+
+def update_team_season(key, batches, state):
+    """
+    applyInPandasWithState function keeping the finished matches of a team season.
+
+    Every match is stored by id with the Kafka timestamp of the version kept, so
+    a later update (a corrected score, a match moved out of FINISHED) replaces
+    the earlier one instead of being counted twice.
+    """
+    if state.hasTimedOut:
+        state.remove()
+        return
+
+    matches = json.loads(state.get[0]) if state.exists else {}
+    for pdf in batches:
+        for row in pdf.itertuples(index=False):
+            match_id = str(row.match_id)
+            version = int(pd.Timestamp(row.timestamp).value)
+            if match_id in matches and matches[match_id][3] > version:
+                continue
+            if row.status == "FINISHED" and not pd.isna(row.goals_for) and not pd.isna(row.goals_against):
+                matches[match_id] = [row.match_date, int(row.goals_for), int(row.goals_against), version]
+            else:
+                matches.pop(match_id, None)
+
+    state.update((json.dumps(matches),))
+    state.setTimeoutTimestamp(state.getCurrentWatermarkMs() + AGGREGATE_STATE_TIMEOUT_MS)
+    yield pd.DataFrame([summarize_team_season(key, matches)], columns=TEAM_SEASON_AGGREGATE.fieldNames())
+
+def save_aggregates(df, epoch_id) -> None:
+    """Upsert the team season aggregates updated in a micro-batch."""
+    save_to_mongo(df, "team_season_aggregates")
+    logger.info(f"Processed aggregate batch {epoch_id}")
+
+def create_aggregation_stream(spark: SparkSession):
+    """Start the stateful stream maintaining standings and form per team, competition and season."""
+    matches_df = spark.readStream \
+        .format("kafka") \
+        .option("kafka.bootstrap.servers", KAFKA_BROKER) \
+        .option("subscribe", TOPICS["matches"]) \
+        .option("includeHeaders", "true") \
+        .option("startingOffsets", STARTING_OFFSETS) \
+        .option("maxOffsetsPerTrigger", MAX_OFFSETS_PER_TRIGGER) \
+        .load()
+
+    aggregates = team_results(decode_messages(matches_df, TOPICS["matches"], MATCHES_MESSAGE)) \
+        .withWatermark("timestamp", AGGREGATE_WATERMARK_DELAY) \
+        .groupBy("team_id", "competition_id", "season") \
+        .applyInPandasWithState(
+            update_team_season,
+            outputStructType=TEAM_SEASON_AGGREGATE,
+            stateStructType=TEAM_SEASON_STATE,
+            outputMode="update",
+            timeoutConf=GroupStateTimeout.EventTimeTimeout
+        )
+
+    return aggregates.writeStream \
+        .queryName("team-season-aggregates") \
+        .outputMode("update") \
+        .foreachBatch(save_aggregates) \
+        .option("checkpointLocation", os.path.join(CHECKPOINT_DIR, "team-season-aggregates")) \
+        .trigger(processingTime=AGGREGATE_TRIGGER_INTERVAL) \
+        .start()
+
+def run_queries(spark: SparkSession) -> None:
+    """Start the streaming queries and restart any that terminates; raises once one fails too often in a row."""
+    starters = {"kafka-to-mongodb": create_stream, "team-season-aggregates": create_aggregation_stream}
+    queries = {name: start(spark) for name, start in starters.items()}
+    started_at = {name: time.monotonic() for name in starters}
+    restarts = {name: 0 for name in starters}
+    logger.info("Streams started successfully")
+    while True:
+        try:
+            spark.streams.awaitAnyTermination()
+        except Exception as e:
+            logger.error(f"Streaming query failed: {e}")
+        spark.streams.resetTerminated()
+        for name, query in queries.items():
+            if query.isActive:
+                continue
+            if time.monotonic() - started_at[name] >= QUERY_HEALTHY_SECONDS:
+                restarts[name] = 0
+            restarts[name] += 1
+            if restarts[name] > MAX_QUERY_RESTARTS:
+                raise RuntimeError(f"Query {name} failed {MAX_QUERY_RESTARTS + 1} times in a row: {query.exception()}")
+            logger.warning(f"Restarting query {name} from its checkpoint ({restarts[name]}/{MAX_QUERY_RESTARTS})")
+            time.sleep(QUERY_RESTART_DELAY_SECONDS)
+            queries[name] = starters[name](spark)
+            started_at[name] = time.monotonic()
+
 def main():
     """Main execution function."""
     try:
-        # Initialize Spark and MongoDB
         spark = create_spark_session()
+        start_metrics_server(spark)
         mongo_client = get_mongo_client()
-        db = mongo_client[DATABASE_NAME]
-        
-        # Create streams for all topics
-        queries = []
-        for collection_name, topic in TOPICS.items():
-            query = create_stream(spark, topic, collection_name, db)
-            queries.append(query)
-        
-        logger.info("All streams started successfully")
-        
-        # Wait for all queries to terminate
-        for query in queries:
-            query.awaitTermination()
+        ensure_indexes(mongo_client[DATABASE_NAME])
+        mongo_client.close()
+        # Ship the wire format decoder and its schema registry to the executors
+        spark.sparkContext.addPyFile(wire_format.__file__)
+        spark.sparkContext.addFile(wire_format.SCHEMA_REGISTRY_PATH)
         
+        run_queries(spark)
+
     except Exception as e:
         logger.error(f"Application error: {e}")
-    finally:
-        if 'mongo_client' in locals():
-            mongo_client.close()
-            logger.info("MongoDB connection closed")
+        # a failed stream stops ingestion for every topic: let the container be restarted
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
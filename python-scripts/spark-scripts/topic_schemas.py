@@ -0,0 +1,167 @@
+from pyspark.sql.types import (
+    ArrayType, IntegerType, LongType, StringType, StructField, StructType
+)
+
+# Explicit schemas for the Kafka messages. Only the fields the pooling
+# service maps to MySQL are declared; from_json drops everything else.
+
+AREA = StructType([
+    StructField("id", LongType()),
+    StructField("name", StringType()),
+    StructField("code", StringType()),
+    StructField("flag", StringType()),
+])
+
+COMPETITION = StructType([
+    StructField("id", LongType()),
+    StructField("name", StringType()),
+    StructField("code", StringType()),
+    StructField("type", StringType()),
+    StructField("emblem", StringType()),
+])
+
+SEASON = StructType([
+    StructField("id", LongType()),
+    StructField("startDate", StringType()),
+    StructField("endDate", StringType()),
+    StructField("currentMatchday", IntegerType()),
+])
+
+TEAM_REF = StructType([
+    StructField("id", LongType()),
+    StructField("name", StringType()),
+    StructField("shortName", StringType()),
+    StructField("tla", StringType()),
+    StructField("crest", StringType()),
+])
+
+GOALS = StructType([
+    StructField("home", IntegerType()),
+    StructField("away", IntegerType()),
+])
+
+MATCH = StructType([
+    StructField("id", LongType()),
+    StructField("utcDate", StringType()),
+    StructField("status", StringType()),
+    StructField("matchday", IntegerType()),
+    StructField("stage", StringType()),
+    StructField("group", StringType()),
+    StructField("lastUpdated", StringType()),
+    StructField("area", AREA),
+    StructField("competition", COMPETITION),
+    StructField("season", SEASON),
+    StructField("homeTeam", TEAM_REF),
+    StructField("awayTeam", TEAM_REF),
+    StructField("score", StructType([
+        StructField("winner", StringType()),
+        StructField("duration", StringType()),
+        StructField("fullTime", GOALS),
+        StructField("halfTime", GOALS),
+    ])),
+])
+
+COACH = StructType([
+    StructField("id", LongType()),
+    StructField("firstName", StringType()),
+    StructField("lastName", StringType()),
+    StructField("name", StringType()),
+    StructField("dateOfBirth", StringType()),
+    StructField("nationality", StringType()),
+])
+
+TEAM = StructType([
+    StructField("id", LongType()),
+    StructField("name", StringType()),
+    StructField("shortName", StringType()),
+    StructField("tla", StringType()),
+    StructField("crest", StringType()),
+    StructField("address", StringType()),
+    StructField("website", StringType()),
+    StructField("founded", IntegerType()),
+    StructField("clubColors", StringType()),
+    StructField("venue", StringType()),
+    StructField("area", AREA),
+    StructField("coach", COACH),
+    StructField("runningCompetitions", ArrayType(COMPETITION)),
+])
+
+PLAYER = StructType([
+    StructField("id", LongType()),
+    StructField("name", StringType()),
+    StructField("firstName", StringType()),
+    StructField("lastName", StringType()),
+    StructField("dateOfBirth", StringType()),
+    StructField("nationality", StringType()),
+    StructField("section", StringType()),
+    StructField("position", StringType()),
+])
+
+SCORER = StructType([
+    StructField("player", PLAYER),
+    StructField("team", TEAM_REF),
+    StructField("playedMatches", IntegerType()),
+    StructField("goals", IntegerType()),
+    StructField("assists", IntegerType()),
+    StructField("penalties", IntegerType()),
+])
+
+STANDING = StructType([
+    StructField("position", IntegerType()),
+    StructField("team", TEAM_REF),
+    StructField("playedGames", IntegerType()),
+    StructField("form", StringType()),
+    StructField("won", IntegerType()),
+    StructField("draw", IntegerType()),
+    StructField("lost", IntegerType()),
+    StructField("points", IntegerType()),
+    StructField("goalsFor", IntegerType()),
+    StructField("goalsAgainst", IntegerType()),
+    StructField("goalDifference", IntegerType()),
+])
+
+STANDINGS_TABLE = StructType([
+    StructField("stage", StringType()),
+    StructField("type", StringType()),
+    StructField("group", StringType()),
+    StructField("table", ArrayType(STANDING)),
+])
+
+
+def envelope(singular: str, plural: str, entity: StructType) -> StructType:
+    """
+    Message schema for a topic: season and competition plus either a single
+    entity (current producer) or a list of them (older whole-payload messages).
+    """
+    return StructType([
+        StructField("season", IntegerType()),
+        StructField("competition", COMPETITION),
+        StructField(singular, entity),
+        StructField(plural, ArrayType(entity)),
+    ])
+
+
+COMPETITIONS_MESSAGE = StructType([
+    StructField("id", LongType()),
+    StructField("area", AREA),
+    StructField("name", StringType()),
+    StructField("code", StringType()),
+    StructField("type", StringType()),
+    StructField("emblem", StringType()),
+    StructField("currentSeason", SEASON),
+])
+
+TEAMS_MESSAGE = envelope("team", "teams", TEAM)
+MATCHES_MESSAGE = envelope("match", "matches", MATCH)
+SCORERS_MESSAGE = envelope("scorer", "scorers", SCORER)
+STANDINGS_MESSAGE = StructType([
+    StructField("season", IntegerType()),
+    StructField("competition", COMPETITION),
+    StructField("area", AREA),
+    StructField("stage", StringType()),
+    StructField("type", StringType()),
+    StructField("group", StringType()),
+    StructField("standing", STANDING),
+    # Older messages carried the whole /standings response
+    StructField("standings", StructType([StructField("standings", ArrayType(STANDINGS_TABLE))])),
+])
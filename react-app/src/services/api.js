@@ -3,6 +3,9 @@ import axios from 'axios';
 // Base API configuration
 const BASE_URL = 'http://192.168.1.8:8001/api';
 
+// Points per chart series; the API downsamples longer series
+const CHART_MAX_POINTS = 200;
+
 const api = axios.create({
     baseURL: BASE_URL,
     headers: {
@@ -205,12 +208,16 @@ const apiService = {
         }
     },
     getCompetitionDetails: (id) => api.get(`/competitions/${id}/`),
-    getCompetitionAnalytics: (id) => api.get(`/analytics/competition/${id}/`),
+    getCompetitionAnalytics: (id) => api.get(`/analytics/competition/${id}/`, {
+        params: { max_points: CHART_MAX_POINTS }
+    }),
 
     // Analytics
     getAnalyticsOverview: async () => {
         try {
-            const response = await api.get('analytics/overview/');
+            const response = await api.get('analytics/overview/', {
+                params: { max_points: CHART_MAX_POINTS }
+            });
             console.log('Analytics Overview Response:', response.data);
             return response.data;
         } catch (error) {
@@ -241,6 +248,17 @@ const apiService = {
             throw error;
         }
     },
+    // Conditional GET: resolves to { notModified: true } when the data behind `etag` has not changed
+    getIfModified: async (url, etag) => {
+        const response = await api.get(url, {
+            headers: etag ? { 'If-None-Match': etag } : {},
+            validateStatus: (status) => (status >= 200 && status < 300) || status === 304
+        });
+        if (response.status === 304) {
+            return { notModified: true, etag };
+        }
+        return { notModified: false, etag: response.headers.etag, data: response.data };
+    },
     post: (endpoint, data) => api.post(endpoint, data),
     put: (endpoint, data) => api.put(endpoint, data),
     patch: (endpoint, data) => api.patch(endpoint, data),
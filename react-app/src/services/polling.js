@@ -6,6 +6,8 @@ class PollingService {
         this.subscribers = new Map();
         this.DEFAULT_INTERVAL = 5000; // 5 seconds
         this.retryCount = new Map();
+        this.etags = new Map();
+        this.lastData = new Map(); // payload behind each stored ETag
         this.MAX_RETRIES = 3;
     }
 
@@ -17,6 +19,15 @@ class PollingService {
         }
         this.subscribers.get(endpoint).add(callback);
 
+        // Polls answered 304 won't notify a late subscriber, so hand it the data the others have
+        if (this.lastData.has(endpoint)) {
+            try {
+                callback(this.lastData.get(endpoint));
+            } catch (error) {
+                console.error(`Error in subscriber callback for ${endpoint}:`, error);
+            }
+        }
+
         // Start polling if it's not already started for this endpoint
         if (!this.pollingIntervals.has(endpoint)) {
             this.startPolling(endpoint, interval);
@@ -35,6 +46,8 @@ class PollingService {
                 this.stopPolling(endpoint);
                 this.subscribers.delete(endpoint);
                 this.retryCount.delete(endpoint);
+                this.etags.delete(endpoint);
+                this.lastData.delete(endpoint);
             }
         }
     }
@@ -43,9 +56,18 @@ class PollingService {
     startPolling(endpoint, interval) {
         const poll = async () => {
             try {
-                const response = await apiService.get(endpoint);
+                const response = await apiService.getIfModified(endpoint, this.etags.get(endpoint));
                 this.retryCount.set(endpoint, 0); // Reset retry count on success
 
+                // 304: subscribers already have this data, keep it
+                if (response.notModified) {
+                    return;
+                }
+                if (response.etag) {
+                    this.etags.set(endpoint, response.etag);
+                }
+                this.lastData.set(endpoint, response.data);
+
                 // Notify all subscribers
                 const subscribers = this.subscribers.get(endpoint);
                 if (subscribers) {